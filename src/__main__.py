@@ -0,0 +1,65 @@
+"""
+Unified command line entry point.
+
+    python -m src <command> [args...]
+    python -m src --help
+
+Each command runs the matching module exactly as `python -m <module>` would
+(remaining arguments are passed through). Modules are only imported for the
+command that runs, so e.g. `python -m src analyze` never loads google-ads and
+`python -m src sync` never loads sentence-transformers.
+"""
+
+import argparse
+import runpy
+import sys
+
+# command -> (module, help)
+COMMANDS: dict[str, tuple[str, str]] = {
+    "run-all": ("src.run_all", "run the whole pipeline step by step"),
+    "sync": ("src.sync_client_accounts", "sync client accounts from the MCC"),
+    "fetch-daily": ("src.fetch_daily_metrics", "fetch campaign daily metrics"),
+    "fetch-search-terms": ("src.fetch_search_terms", "fetch search term daily metrics"),
+    "analyze": ("src.analysis_rules", "run the rule-based analysis"),
+    "recommend": ("src.llm_recommender", "generate LLM recommendations"),
+    "index": ("src.rag.index_run", "index the latest run into RAG memory"),
+    "forecast": ("src.forecast", "project month-end spend/ROAS per campaign"),
+    "anomaly": ("src.anomaly", "anomaly statistics maintenance"),
+    "storage": ("src.data.storage", "storage layout maintenance (shards)"),
+    "archive": ("src.data.archive", "archive cold history to Parquet"),
+    "export": ("src.export", "stream a table or query to CSV / NDJSON (gzip)"),
+    "daemon": ("src.daemon", "run the pipeline on a schedule"),
+    "api": ("src.api", "serve the local read API"),
+    "list-accounts": ("src.debug.list_accounts", "list accessible Google Ads customers"),
+    "list-client-accounts": ("src.debug.list_client_accounts", "list stored client accounts"),
+    "view-data": ("src.debug.view_data", "print ROAS per campaign (180 days)"),
+    "check-duplicates": ("src.debug.check_campaign_duplicates", "look for duplicate campaign_daily rows"),
+    "explain-queries": ("src.debug.explain_queries", "check query plans against a synthetic database"),
+    "import-budget": ("src.debug.import_budget", "report import time per command"),
+    "bench-decode": ("src.debug.bench_decode", "benchmark search_stream decoding (rows/sec)"),
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    width = max(len(name) for name in COMMANDS)
+    epilog = "commands:\n" + "\n".join(f"  {name:<{width}}  {help_}" for name, (_, help_) in COMMANDS.items())
+    parser = argparse.ArgumentParser(
+        prog="python -m src",
+        description="Google Ads performance reporter",
+        epilog=epilog,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("command", choices=COMMANDS, metavar="command")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="arguments passed to the command")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = build_parser().parse_args(argv)
+    module, _ = COMMANDS[args.command]
+    sys.argv = [f"python -m src {args.command}", *args.args]
+    runpy.run_module(module, run_name="__main__", alter_sys=True)
+
+
+if __name__ == "__main__":
+    main()
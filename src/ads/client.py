@@ -0,0 +1,55 @@
+"""
+Process-wide Google Ads client factory.
+
+Loading the client parses google-ads.yaml, builds fresh OAuth credentials
+(forcing a token refresh on the first call) and every get_service() call
+opens a new gRPC channel. Caching the client and its service stubs here means
+all accounts and pipeline steps in the same process share one set of
+credentials (the access token is reused until it expires) and one channel
+per service.
+
+google-ads (protobuf + gRPC) is imported on first use, so modules that only
+reference this factory stay cheap to import.
+
+Clients are built in proto-plus mode by default (what most callers expect,
+e.g. `status.name` on enums). The fetchers ask for `use_proto_plus=False`
+and get raw protobuf messages instead (see src/ads/decode.py); both clients
+share the same google-ads.yaml and are cached separately.
+"""
+
+from typing import TYPE_CHECKING
+
+from src.config import settings
+
+if TYPE_CHECKING:
+    from google.ads.googleads.client import GoogleAdsClient
+
+_client_cache: dict[tuple[str, bool], "GoogleAdsClient"] = {}
+_service_cache: dict[tuple[str, bool, str], object] = {}
+
+
+def get_client(config_path=None, use_proto_plus: bool = True) -> "GoogleAdsClient":
+    path = str(config_path or settings.ads_config_path)
+    key = (path, use_proto_plus)
+    if key not in _client_cache:
+        from google.ads.googleads import config
+        from google.ads.googleads.client import GoogleAdsClient
+
+        client_config = config.load_from_yaml_file(path)
+        client_config["use_proto_plus"] = use_proto_plus
+        _client_cache[key] = GoogleAdsClient.load_from_dict(client_config)
+    return _client_cache[key]
+
+
+def get_service(name: str, config_path=None, use_proto_plus: bool = True):
+    path = str(config_path or settings.ads_config_path)
+    key = (path, use_proto_plus, name)
+    if key not in _service_cache:
+        _service_cache[key] = get_client(path, use_proto_plus).get_service(name)
+    return _service_cache[key]
+
+
+def reset() -> None:
+    """Drop cached clients and stubs (e.g. after credentials were rotated)."""
+    _service_cache.clear()
+    _client_cache.clear()
@@ -0,0 +1,172 @@
+"""
+Request scheduler in front of every GoogleAdsService.search_stream call.
+
+- Paces requests with a token bucket shared per developer token.
+- Retries transient failures (quota exhaustion, internal/unavailable errors)
+  with jittered exponential backoff instead of killing the step.
+- Orders accounts by recent spend so high-value data lands first when quota
+  runs short. An account that still fails (retries used up, or a
+  non-retryable error such as PERMISSION_DENIED) is logged and skipped; the
+  others are still fetched.
+- With the sharded storage layout, runs up to FETCH_WORKERS accounts in
+  parallel (each account writes to its own shard).
+
+On retry the whole stream is replayed from the start. Writers upsert, so
+batches that were already consumed before the failure are written again
+without creating duplicates.
+
+grpc and google-ads are imported lazily; status codes are matched by name.
+"""
+
+import random
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from src.ads.client import get_client, get_service
+from src.config import settings
+from src.data.client_accounts import get_recent_spend_by_account
+from src.data.db import lock_wait_summary
+
+RETRYABLE_STATUS_CODES = {
+    "RESOURCE_EXHAUSTED",
+    "INTERNAL",
+    "UNAVAILABLE",
+    "DEADLINE_EXCEEDED",
+    "ABORTED",
+}
+
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` requests/second, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Block until a token is available. Returns the time spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return waited
+                wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+_buckets: dict[str, TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def _bucket_for(developer_token: str) -> TokenBucket:
+    with _buckets_lock:
+        if developer_token not in _buckets:
+            _buckets[developer_token] = TokenBucket(settings.ads_requests_per_second)
+        return _buckets[developer_token]
+
+
+def _retryable_errors() -> tuple[type, ...]:
+    import grpc
+    from google.ads.googleads.errors import GoogleAdsException
+
+    return (GoogleAdsException, grpc.RpcError)
+
+
+def _status_code(exc: Exception):
+    error = getattr(exc, "error", None)
+    if error is not None and callable(getattr(error, "code", None)):
+        return error.code()  # GoogleAdsException wraps the grpc.Call
+    if callable(getattr(exc, "code", None)):
+        return exc.code()  # grpc.RpcError
+    return None
+
+
+def is_retryable(exc: Exception) -> bool:
+    code = _status_code(exc)
+    return code is not None and code.name in RETRYABLE_STATUS_CODES
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff: uniform(0, min(cap, base * 2**attempt))."""
+    return random.uniform(0.0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)))
+
+
+def search_stream(customer_id: str, query: str, raw: bool = False):
+    """
+    Rate-limited, retrying replacement for GoogleAdsService.search_stream.
+    With `raw=True` batches are raw protobuf messages instead of proto-plus.
+    """
+    ga_service = get_service("GoogleAdsService", use_proto_plus=not raw)
+    bucket = _bucket_for(get_client(use_proto_plus=not raw).developer_token)
+    retryable_errors = _retryable_errors()
+
+    attempt = 0
+    while True:
+        bucket.acquire()
+        try:
+            for batch in ga_service.search_stream(customer_id=customer_id, query=query):
+                yield batch
+            return
+        except retryable_errors as e:
+            if not is_retryable(e) or attempt >= settings.ads_max_retries:
+                raise
+            delay = backoff_delay(attempt)
+            attempt += 1
+            print(
+                f"Transient Google Ads error for customer {customer_id} ({_status_code(e).name}); "
+                f"retry {attempt}/{settings.ads_max_retries} in {delay:.1f}s"
+            )
+            time.sleep(delay)
+
+
+def prioritize_accounts(accounts: list[str], days: int | None = None) -> list[str]:
+    """Highest recent spend first; accounts without local data go last."""
+    spend = get_recent_spend_by_account(days or settings.priority_lookback_days)
+    return sorted(accounts, key=lambda cid: (-spend.get(cid, 0), cid))
+
+
+def fetch_accounts(fetch_one, accounts: list[str], label: str) -> list[str]:
+    """
+    Run `fetch_one(customer_id)` for every account, highest recent spend first.
+    Returns the accounts that failed.
+    """
+    ordered = prioritize_accounts(accounts)
+    workers = settings.fetch_workers if settings.storage_layout == "sharded" else 1
+    failed = []
+
+    def run(customer_id: str) -> None:
+        started = time.perf_counter()
+        try:
+            stats = fetch_one(customer_id)
+        except Exception as e:
+            failed.append(customer_id)
+            print(f"{label} for customer {customer_id}: FAILED after {time.perf_counter() - started:.2f}s: {e}")
+            traceback.print_exc()
+            return
+        print(f"{label} for customer {customer_id}: done in {time.perf_counter() - started:.2f}s ({stats})")
+
+    if workers <= 1:
+        for customer_id in ordered:
+            print(f"\n{label} for customer {customer_id}")
+            run(customer_id)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(run, ordered))
+
+    print(f"{label}: {lock_wait_summary()}")
+    if failed:
+        print(f"{label}: {len(failed)}/{len(ordered)} account(s) failed: {', '.join(sorted(failed))}")
+    return failed
@@ -4,6 +4,10 @@ analysis_rules.py
 Rule-based analysis for Google Ads performance data stored in SQLite.
 Outputs a structured JSON with recommended actions for:
 - Search terms (negative keyword candidates)
+- N-grams shared by many wasteful search terms (see ngram_analysis.py)
+- Clusters of near-duplicate negative candidates (see term_clustering.py)
+- Per-campaign day-level anomalies recorded during ingestion (see anomaly.py)
+- Month-end spend/ROAS projections and pacing alerts (see forecast.py)
 - Campaign scaling candidates (winners)
 - Campaign pause/restructure candidates (losers)
 
@@ -13,10 +17,16 @@ Assumptions:
 - Conversion value column in DB: conversions_value
 """
 
-import sqlite3
 from datetime import date, timedelta
 import json
 from src.config import settings
+from src.data.archive import add_cold_sums
+from src.data.db import connect, init_db, reader, write_transaction
+from src.data.storage import connect_analytics
+from src.data.versioning import cache_key, get_data_version, load_cached_analysis, store_cached_analysis
+from src.ngram_analysis import find_ngram_negatives
+from src.anomaly import recent_anomalies
+from src.forecast import history_start, pacing_alerts
 
 # =========================
 # MODE CONFIGURATION
@@ -33,6 +43,16 @@ CONFIG = {
             "min_clicks": 20,
             "min_cost": 30.0,  # BRL
         },
+        "ngrams": {
+            "max_n": 2,
+            "min_terms": 5,
+            "min_clicks": 40,
+            "min_cost": 60.0,  # BRL
+            "max_candidates": 30,
+        },
+        "search_term_clusters": {
+            "min_similarity": 0.85,
+        },
         "campaign_winners": {
             "min_roas": 1.2,
             "min_conversions": 2,
@@ -42,6 +62,13 @@ CONFIG = {
             "min_cost": 300.0,  # BRL
             "conversions_equals": 0,
         },
+        "pacing": {
+            "history_days": 56,
+            "min_active_days": 14,
+            "spend_tolerance": 0.2,
+            "roas_tolerance": 0.25,
+            "min_projected_cost": 300.0,  # BRL
+        },
     },
     "LIVE": {
         # 🔑 window_days agora vem da config central
@@ -50,6 +77,16 @@ CONFIG = {
             "min_clicks": 10,
             "min_cost": 20.0,  # BRL
         },
+        "ngrams": {
+            "max_n": 2,
+            "min_terms": 3,
+            "min_clicks": 20,
+            "min_cost": 40.0,  # BRL
+            "max_candidates": 30,
+        },
+        "search_term_clusters": {
+            "min_similarity": 0.85,
+        },
         "campaign_winners": {
             "min_roas": 1.2,
             "min_conversions": 2,
@@ -59,6 +96,13 @@ CONFIG = {
             "min_cost": 300.0,  # BRL
             "conversions_equals": 0,
         },
+        "pacing": {
+            "history_days": 56,
+            "min_active_days": 14,
+            "spend_tolerance": 0.2,
+            "roas_tolerance": 0.25,
+            "min_projected_cost": 300.0,  # BRL
+        },
     },
 }
 
@@ -66,6 +110,34 @@ CONFIG = {
 # PATHS (centralizados)
 # =========================
 DB_PATH = settings.db_path
+OUTPUT_PATH = settings.repo_root / "analysis_output.json"
+
+# =========================
+# QUERIES (module-level so src.debug.explain_queries can check their plans)
+# =========================
+# Hot-tier sums only: run_analysis adds the archived rows (add_cold_sums) and
+# applies the thresholds to the merged totals.
+NEGATIVES_SQL = """
+SELECT
+  search_term,
+  SUM(clicks) AS clicks,
+  SUM(cost_micros) AS cost_micros
+FROM search_term_daily
+WHERE date >= ?
+  AND conversions = 0
+GROUP BY search_term
+"""
+
+CAMPAIGN_TOTALS_SQL = """
+SELECT
+  campaign_name,
+  SUM(cost_micros) AS cost_micros,
+  SUM(conversions) AS conv,
+  SUM(conversions_value) AS conv_value
+FROM campaign_daily
+WHERE date >= ?
+GROUP BY campaign_name
+"""
 
 
 def run_analysis() -> dict:
@@ -95,84 +167,76 @@ def run_analysis() -> dict:
         "generated_at": date.today().isoformat(),
         "thresholds": {
             "search_terms": {"min_clicks": st_min_clicks, "min_cost": st_min_cost, "conversions": 0},
+            "ngrams": dict(cfg["ngrams"]),
             "campaign_winners": {"min_roas": win_min_roas, "min_conversions": win_min_conv, "min_cost": win_min_cost},
             "campaign_losers": {"min_cost": lose_min_cost, "conversions_equals": lose_conv_eq},
+            "pacing": dict(cfg["pacing"]),
         },
         "campaign_actions": [],
         "search_term_actions": [],
+        "ngram_actions": [],
+        "anomalies": [],
+        "forecast": {},
+        "pacing_alerts": [],
     }
 
     if not DB_PATH.exists():
         raise FileNotFoundError(f"SQLite DB not found at: {DB_PATH.resolve()}")
 
-    con = sqlite3.connect(DB_PATH)
+    # The forecast reads further back than the decision window (fit window + last month).
+    con = connect_analytics(min(since, history_start(date.today(), int(cfg["pacing"]["history_days"])).isoformat()))
     cur = con.cursor()
 
     # =========================
     # 1) SEARCH TERMS – NEGATIVES
     # =========================
-    cur.execute(
-        """
-        SELECT
-          search_term,
-          SUM(clicks) AS clicks,
-          SUM(cost_micros) / 1e6 AS cost
-        FROM search_term_daily
-        WHERE date >= ?
-          AND conversions = 0
-        GROUP BY search_term
-        HAVING clicks >= ? AND cost >= ?
-        ORDER BY cost DESC
-        """,
-        (since, st_min_clicks, st_min_cost),
+    negatives = add_cold_sums(
+        con, cur.execute(NEGATIVES_SQL, (since,)).fetchall(),
+        "search_term_daily", ("search_term",), ("clicks", "cost_micros"), since, zero=("conversions",),
     )
+    negatives = [(term, clicks or 0, (cost_micros or 0) / 1e6) for term, clicks, cost_micros in negatives]
 
-    for term, clicks, cost in cur.fetchall():
+    for term, clicks, cost in sorted(negatives, key=lambda r: -r[2]):
+        if clicks < st_min_clicks or cost < st_min_cost:
+            continue
         result["search_term_actions"].append(
             {
                 "type": "ADD_NEGATIVE",
                 "search_term": term,
-                "clicks": int(clicks or 0),
-                "cost": round(float(cost or 0.0), 2),
+                "clicks": int(clicks),
+                "cost": round(cost, 2),
                 "why": f"Spend with zero conversions in last {window_days} days (thresholds: clicks>={st_min_clicks}, cost>={st_min_cost})",
             }
         )
 
+    # =========================
+    # 1b) SEARCH TERM N-GRAMS – NEGATIVES
+    # =========================
+    result["ngram_actions"] = find_ngram_negatives(con, since, cfg["ngrams"], window_days)
+
     # =========================
     # 2) CAMPAIGNS – WINNERS (SCALE)
     # =========================
-    cur.execute(
-        """
-        SELECT
-          campaign_name,
-          SUM(cost_micros) / 1e6 AS cost,
-          SUM(conversions) AS conv,
-          SUM(conversions_value) AS conv_value,
-          CASE
-            WHEN SUM(cost_micros) > 0
-            THEN (SUM(conversions_value) / (SUM(cost_micros) / 1e6))
-            ELSE 0
-          END AS roas
-        FROM campaign_daily
-        WHERE date >= ?
-        GROUP BY campaign_name
-        HAVING roas >= ?
-           AND conv >= ?
-           AND cost >= ?
-        ORDER BY roas DESC
-        """,
-        (since, win_min_roas, win_min_conv, win_min_cost),
+    campaigns = add_cold_sums(
+        con, cur.execute(CAMPAIGN_TOTALS_SQL, (since,)).fetchall(),
+        "campaign_daily", ("campaign_name",), ("cost_micros", "conversions", "conversions_value"), since,
     )
+    campaigns = [
+        (name, (cost_micros or 0) / 1e6, conv or 0.0, conv_value or 0.0) for name, cost_micros, conv, conv_value in campaigns
+    ]
 
-    for name, cost, conv, conv_value, roas in cur.fetchall():
+    winners = [(name, cost, conv, conv_value, conv_value / cost if cost > 0 else 0.0) for name, cost, conv, conv_value in campaigns]
+    for name, cost, conv, conv_value, roas in sorted(winners, key=lambda r: -r[4]):
+        if roas < win_min_roas or conv < win_min_conv or cost < win_min_cost:
+            continue
         result["campaign_actions"].append(
             {
                 "type": "SCALE_WINNER",
                 "campaign": name,
-                "cost": round(float(cost or 0.0), 2),
-                "conversions": round(float(conv or 0.0), 2),
-                "conversions_value": round(float(conv_value or 0.0), 2),
-                "roas": round(float(roas or 0.0), 2),
+                "cost": round(cost, 2),
+                "conversions": round(conv, 2),
+                "conversions_value": round(conv_value, 2),
+                "roas": round(roas, 2),
                 "suggestion": "Increase budget gradually (+10–20%) or duplicate into a tighter structure (more specific keywords/ad groups).",
             }
         )
@@ -180,42 +244,90 @@ def run_analysis() -> dict:
     # =========================
     # 3) CAMPAIGNS – LOSERS (PAUSE / RESTRUCTURE)
     # =========================
-    cur.execute(
-        """
-        SELECT
-          campaign_name,
-          SUM(cost_micros) / 1e6 AS cost,
-          SUM(conversions) AS conv
-        FROM campaign_daily
-        WHERE date >= ?
-        GROUP BY campaign_name
-        HAVING cost >= ?
-           AND conv = ?
-        ORDER BY cost DESC
-        """,
-        (since, lose_min_cost, lose_conv_eq),
-    )
-
-    for name, cost, conv in cur.fetchall():
+    for name, cost, conv, _ in sorted(campaigns, key=lambda r: -r[1]):
+        if cost < lose_min_cost or conv != lose_conv_eq:
+            continue
         result["campaign_actions"].append(
             {
                 "type": "PAUSE_OR_RESTRUCTURE",
                 "campaign": name,
-                "cost": round(float(cost or 0.0), 2),
-                "conversions": round(float(conv or 0.0), 2),
+                "cost": round(cost, 2),
+                "conversions": round(conv, 2),
                 "why": f"High spend with zero conversions in last {window_days} days (threshold: cost>={lose_min_cost})",
             }
         )
 
+    # =========================
+    # 4) CAMPAIGNS – ANOMALIES (recorded incrementally at ingestion)
+    # =========================
+    result["anomalies"] = recent_anomalies(con, since)
+
+    # =========================
+    # 5) CAMPAIGNS – MONTH-END PACING
+    # =========================
+    result["forecast"], result["pacing_alerts"] = pacing_alerts(con, cfg["pacing"])
+
     con.close()
     return result
 
 
-if __name__ == "__main__":
-    actions = run_analysis()
-    output_path = settings.repo_root / "analysis_output.json"
+def cluster_candidates(result: dict) -> tuple[list, dict]:
+    """
+    Clustering stage: consolidate near-duplicate search_term_actions (see
+    term_clustering.py). Optional — an empty list means the LLM falls back to
+    the per-term actions. Returns (clusters, new term vectors to store); runs
+    outside any write transaction, since a cold model load can take a while.
+    """
+    min_similarity = float(CONFIG[MODE]["search_term_clusters"]["min_similarity"])
+    try:
+        from src.term_clustering import cluster_search_term_actions
+        with reader() as con:
+            return cluster_search_term_actions(con, result["search_term_actions"], min_similarity)
+    except Exception as e:
+        print(f"Search term clustering skipped: {e}")
+        return [], {}
+
+
+def run_analysis_cached() -> dict:
+    """
+    run_analysis() memoized on (data_version, MODE, CONFIG[MODE], window end).
+    Ingestion bumps data_version, so an unchanged rerun returns the stored result.
+    """
+    if not DB_PATH.exists():
+        raise FileNotFoundError(f"SQLite DB not found at: {DB_PATH.resolve()}")
+
+    init_db()
+
+    with reader() as con:
+        data_version = get_data_version(con)
+        key = cache_key(data_version, MODE, CONFIG.get(MODE), date.today().isoformat())
+        cached = load_cached_analysis(con, key)
 
-    with open(output_path, "w", encoding="utf-8") as f:
+    if cached is not None:
+        print(f"No new data since last analysis (data_version={data_version}); using cached result.")
+        return cached
+
+    result = run_analysis()
+    result["search_term_clusters"], new_vectors = cluster_candidates(result)
+
+    con = connect()
+    with write_transaction(con):
+        if new_vectors:
+            from src.term_clustering import store_term_vectors
+            store_term_vectors(con, new_vectors)
+        store_cached_analysis(con, key, data_version, result)
+    con.close()
+
+    return result
+
+
+def write_output(actions: dict) -> None:
+    with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
         json.dump(actions, f, indent=2, ensure_ascii=False)
 
+
+if __name__ == "__main__":
+    actions = run_analysis_cached()
+    write_output(actions)
+
     print(json.dumps(actions, indent=2, ensure_ascii=False))
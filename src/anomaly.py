@@ -0,0 +1,193 @@
+"""
+anomaly.py
+
+Incremental per-campaign anomaly detection.
+
+For every (customer, campaign) and metric (cost, clicks, conversions, ROAS)
+campaign_stats keeps an exponentially weighted mean and variance. When
+ingestion lands a new day for a campaign, the day's value is compared with
+the running estimate *before* it is folded in; |z| >= Z_THRESHOLD is stored in
+campaign_anomalies. Each new row costs O(1) work: no history is rescanned.
+
+Days younger than settings.anomaly_settle_days are held back because
+conversions are still being attributed; the rolling fetch window brings them
+back on a later run, once settled.
+
+Rebuild from the stored history with:
+    python -m src.anomaly --rebuild
+"""
+
+import argparse
+import math
+from datetime import date, timedelta
+
+from src.config import settings
+from src.data.archive import add_cold_rows, cold_sums
+from src.data.db import init_db, write_transaction
+from src.data.storage import FULL_HISTORY, connect_account, connect_analytics
+from src.data.versioning import bump_data_version
+
+METRICS = ("cost", "clicks", "conversions", "roas")
+
+EWMA_SPAN_DAYS = 14
+ALPHA = 2.0 / (EWMA_SPAN_DAYS + 1)
+WARMUP_DAYS = 7
+Z_THRESHOLD = 3.0
+
+# Floor for the standard deviation so tiny absolute moves on very stable
+# series (e.g. 0 -> 1 conversion) are not flagged.
+MIN_STD = {"cost": 5.0, "clicks": 3.0, "conversions": 0.5, "roas": 0.2}
+
+# campaign_daily columns in the order update_campaign_stats unpacks them.
+CAMPAIGN_COLUMNS = (
+    "date", "customer_id", "campaign_id", "campaign_name", "impressions", "clicks",
+    "cost_micros", "conversions", "conversions_value",
+)
+
+ANOMALIES_SQL = """
+SELECT date, customer_id, campaign_id, campaign_name, metric, value, expected, std, z
+FROM campaign_anomalies
+WHERE date >= ?
+ORDER BY date DESC, ABS(z) DESC
+"""
+
+
+def _metric_values(cost_micros: int, clicks: int, conversions: float, conversions_value: float) -> dict:
+    cost = cost_micros / 1e6
+    values = {"cost": cost, "clicks": float(clicks), "conversions": float(conversions)}
+    if cost > 0:
+        values["roas"] = conversions_value / cost
+    return values
+
+
+def _load_stats(con, customer_id: str) -> dict[tuple[str, str], list]:
+    cur = con.execute(
+        "SELECT campaign_id, metric, n, mean, var, last_date FROM campaign_stats WHERE customer_id = ?",
+        (customer_id,),
+    )
+    return {(r[0], r[1]): list(r[2:]) for r in cur}
+
+
+def update_campaign_stats(con, customer_id: str, rows) -> int:
+    """
+    Fold new campaign_daily rows for one account into campaign_stats and record
+    anomalies. `rows` are campaign_daily tuples (date, customer_id, campaign_id,
+    campaign_name, impressions, clicks, cost_micros, conversions,
+    conversions_value); rows already folded in are ignored. Returns the number
+    of anomalies found (caller commits).
+    """
+    settled = (date.today() - timedelta(days=settings.anomaly_settle_days)).isoformat()
+    stats = _load_stats(con, customer_id)
+    anomalies = []
+
+    for d, _, campaign_id, campaign_name, _, clicks, cost_micros, conv, conv_value in sorted(
+        rows, key=lambda r: (r[2], r[0])
+    ):
+        if d > settled:
+            continue
+
+        for metric, x in _metric_values(cost_micros, clicks, conv, conv_value).items():
+            state = stats.get((campaign_id, metric))
+            if state is None:
+                stats[(campaign_id, metric)] = [1, x, 0.0, d]
+                continue
+
+            n, mean, var, last_date = state
+            if d <= last_date:
+                continue
+
+            if n >= WARMUP_DAYS:
+                std = max(math.sqrt(var), MIN_STD[metric])
+                z = (x - mean) / std
+                if abs(z) >= Z_THRESHOLD:
+                    anomalies.append((d, customer_id, campaign_id, campaign_name, metric, x, mean, std, z))
+
+            diff = x - mean
+            incr = ALPHA * diff
+            state[:] = [n + 1, mean + incr, (1 - ALPHA) * (var + diff * incr), d]
+
+    con.executemany(
+        """
+        INSERT INTO campaign_stats (customer_id, campaign_id, metric, n, mean, var, last_date)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(customer_id, campaign_id, metric) DO UPDATE SET
+          n = excluded.n,
+          mean = excluded.mean,
+          var = excluded.var,
+          last_date = excluded.last_date
+        """,
+        ((customer_id, cid, metric, *state) for (cid, metric), state in stats.items()),
+    )
+    con.executemany(
+        """
+        INSERT INTO campaign_anomalies (date, customer_id, campaign_id, campaign_name, metric, value, expected, std, z)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(date, customer_id, campaign_id, metric) DO NOTHING
+        """,
+        anomalies,
+    )
+    if anomalies:
+        # Settled days can surface anomalies without any row changing.
+        bump_data_version(con)
+    return len(anomalies)
+
+
+def recent_anomalies(con, since: str) -> list[dict]:
+    out = []
+    for d, customer_id, campaign_id, name, metric, value, expected, std, z in con.execute(ANOMALIES_SQL, (since,)):
+        out.append(
+            {
+                "type": "ANOMALY",
+                "date": d,
+                "customer_id": customer_id,
+                "campaign_id": campaign_id,
+                "campaign": name,
+                "metric": metric,
+                "direction": "spike" if z > 0 else "drop",
+                "value": round(value, 2),
+                "expected": round(expected, 2),
+                "z": round(z, 2),
+            }
+        )
+    return out
+
+
+def rebuild() -> None:
+    """
+    Recompute campaign_stats/campaign_anomalies from all stored campaign_daily
+    rows, archived history included.
+    """
+    init_db()
+    analytics = connect_analytics(FULL_HISTORY)
+    customers = sorted(
+        {r[0] for r in analytics.execute("SELECT DISTINCT customer_id FROM campaign_daily")}
+        | {key[0] for key in cold_sums(analytics, "campaign_daily", ("customer_id",), (), FULL_HISTORY)}
+    )
+
+    total = 0
+    for customer_id in customers:
+        rows = analytics.execute(
+            f"SELECT {', '.join(CAMPAIGN_COLUMNS)} FROM campaign_daily WHERE customer_id = ?", (customer_id,)
+        ).fetchall()
+        rows = add_cold_rows(analytics, rows, "campaign_daily", CAMPAIGN_COLUMNS, FULL_HISTORY, customer_id=customer_id)
+
+        con = connect_account(customer_id)
+        with write_transaction(con):
+            con.execute("DELETE FROM campaign_stats WHERE customer_id = ?", (customer_id,))
+            con.execute("DELETE FROM campaign_anomalies WHERE customer_id = ?", (customer_id,))
+            total += update_campaign_stats(con, customer_id, rows)
+            # Deleted anomalies change the readers' results even when none are re-found.
+            bump_data_version(con)
+        con.close()
+    analytics.close()
+    print(f"Rebuilt running stats for {len(customers)} accounts; {total} anomalies recorded.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-campaign anomaly statistics")
+    parser.add_argument("--rebuild", action="store_true", help="recompute from stored campaign_daily history")
+    args = parser.parse_args()
+    if args.rebuild:
+        rebuild()
+    else:
+        parser.print_help()
@@ -0,0 +1,294 @@
+"""
+api.py
+
+Small local read API over the stored tables, for dashboards and analysts.
+
+    python -m src.api            # http://127.0.0.1:8080 (API_PORT)
+
+GET /campaigns?since=YYYY-MM-DD[&until=YYYY-MM-DD][&customer_id=...]
+    Per-campaign cost, conversions, conversion value and ROAS for the window.
+GET /search-terms?since=...[&until=...][&customer_id=...][&limit=N][&after=<term>]
+    Per-search-term aggregates ordered by term. The response body is streamed
+    (chunked); pass the returned `next_after` as `after` to page through large
+    results (keyset pagination).
+
+Responses carry an ETag derived from data_version and the request, and honour
+If-None-Match with 304. Campaign aggregates and whole-window search-term
+aggregates (which the pages are sliced from) are kept in in-memory LRU
+caches; any ingestion bumps data_version, which drops them.
+"""
+
+import bisect
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from src.config import settings
+from src.data.archive import add_cold_sums
+from src.data.db import reader
+from src.data.storage import connect_analytics
+from src.data.versioning import get_data_version
+
+CACHE_MAX_ENTRIES = 256
+SEARCH_TERMS_CACHE_ENTRIES = 16
+STREAM_CHUNK_ROWS = 1000
+SEARCH_TERMS_MAX_LIMIT = 50_000
+
+# One statement per case: `(? IS NULL OR customer_id = ?)` would keep SQLite
+# from using the (customer_id, date) index for a single account.
+CAMPAIGNS_SQL = """
+SELECT
+  campaign_name,
+  SUM(cost_micros) AS cost_micros,
+  SUM(conversions) AS conv,
+  SUM(conversions_value) AS conv_value
+FROM campaign_daily
+WHERE date >= ? AND date <= ?
+GROUP BY campaign_name
+"""
+
+CAMPAIGNS_BY_ACCOUNT_SQL = """
+SELECT
+  campaign_name,
+  SUM(cost_micros) AS cost_micros,
+  SUM(conversions) AS conv,
+  SUM(conversions_value) AS conv_value
+FROM campaign_daily
+WHERE customer_id = ? AND date >= ? AND date <= ?
+GROUP BY campaign_name
+"""
+
+SEARCH_TERMS_SQL = """
+SELECT
+  search_term,
+  SUM(clicks) AS clicks,
+  SUM(cost_micros) AS cost_micros,
+  SUM(conversions) AS conv
+FROM search_term_daily
+WHERE date >= ? AND date <= ?
+GROUP BY search_term
+"""
+
+SEARCH_TERMS_BY_ACCOUNT_SQL = """
+SELECT
+  search_term,
+  SUM(clicks) AS clicks,
+  SUM(cost_micros) AS cost_micros,
+  SUM(conversions) AS conv
+FROM search_term_daily
+WHERE customer_id = ? AND date >= ? AND date <= ?
+GROUP BY search_term
+"""
+
+
+def window_query(all_accounts_sql: str, by_account_sql: str, since: str, until: str, customer_id: str | None) -> tuple[str, tuple]:
+    if customer_id is None:
+        return all_accounts_sql, (since, until)
+    return by_account_sql, (customer_id, since, until)
+
+
+class LRUCache:
+    """Thread-safe LRU keyed by request, invalidated when data_version moves."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data: OrderedDict = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self, version: int, key):
+        with self._lock:
+            if version != self._version:
+                self._data.clear()
+                self._version = version
+                return None
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, version: int, key, value) -> None:
+        with self._lock:
+            if version != self._version:
+                self._data.clear()
+                self._version = version
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+
+_cache = LRUCache()
+# Whole-window search-term aggregates are larger; pages are sliced from them.
+_search_terms_cache = LRUCache(SEARCH_TERMS_CACHE_ENTRIES)
+
+
+def _current_version() -> int:
+    with reader() as con:
+        return get_data_version(con)
+
+
+def _etag(version: int, path: str, params: tuple) -> str:
+    digest = hashlib.sha256(json.dumps([version, path, params]).encode("utf-8")).hexdigest()[:20]
+    return f'"{digest}"'
+
+
+def campaign_aggregates(since: str, until: str, customer_id: str | None) -> list[dict]:
+    con = connect_analytics(since)
+    try:
+        rows = add_cold_sums(
+            con, con.execute(*window_query(CAMPAIGNS_SQL, CAMPAIGNS_BY_ACCOUNT_SQL, since, until, customer_id)).fetchall(),
+            "campaign_daily", ("campaign_name",), ("cost_micros", "conversions", "conversions_value"),
+            since, until, customer_id,
+        )
+    finally:
+        con.close()
+    rows = [(name, (cost_micros or 0) / 1e6, conv or 0.0, conv_value or 0.0) for name, cost_micros, conv, conv_value in rows]
+    return [
+        {
+            "campaign": name,
+            "cost": round(cost, 2),
+            "conversions": round(conv, 2),
+            "conversions_value": round(conv_value, 2),
+            "roas": round(conv_value / cost, 2) if cost else None,
+        }
+        for name, cost, conv, conv_value in sorted(rows, key=lambda r: -r[1])
+    ]
+
+
+def search_term_aggregates(since: str, until: str, customer_id: str | None) -> list[tuple]:
+    """(search_term, clicks, cost_micros, conversions) for the whole window, both tiers, ordered by term."""
+    con = connect_analytics(since)
+    try:
+        rows = add_cold_sums(
+            con, con.execute(*window_query(SEARCH_TERMS_SQL, SEARCH_TERMS_BY_ACCOUNT_SQL, since, until, customer_id)).fetchall(),
+            "search_term_daily", ("search_term",), ("clicks", "cost_micros", "conversions"),
+            since, until, customer_id,
+        )
+    finally:
+        con.close()
+    return sorted(rows)
+
+
+def search_term_page(version: int, since: str, until: str, customer_id: str | None, after: str, limit: int) -> list[tuple]:
+    """
+    Up to `limit` aggregates with search_term > after. The window is
+    aggregated once per data_version; later pages are slices of the cached
+    result.
+    """
+    key = (since, until, customer_id)
+    rows = _search_terms_cache.get(version, key)
+    if rows is None:
+        rows = search_term_aggregates(since, until, customer_id)
+        _search_terms_cache.put(version, key, rows)
+    start = bisect.bisect_right(rows, after, key=lambda r: r[0])
+    return rows[start:start + limit]
+
+
+class ReadAPIHandler(BaseHTTPRequestHandler):
+    server_version = "AdsReadAPI/1.0"
+    protocol_version = "HTTP/1.1"  # required for chunked streaming
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            since = query.get("since") or (date.today() - timedelta(days=settings.analysis_window_days)).isoformat()
+            until = query.get("until") or date.today().isoformat()
+            since, until = date.fromisoformat(since).isoformat(), date.fromisoformat(until).isoformat()
+            customer_id = query.get("customer_id")
+
+            if url.path == "/campaigns":
+                self._campaigns(since, until, customer_id)
+            elif url.path == "/search-terms":
+                limit = int(query.get("limit", 1000))
+                if not 1 <= limit <= SEARCH_TERMS_MAX_LIMIT:
+                    raise ValueError(f"limit must be between 1 and {SEARCH_TERMS_MAX_LIMIT}")
+                self._search_terms(since, until, customer_id, limit, query.get("after", ""))
+            else:
+                self._send_json(404, {"error": f"unknown path {url.path}"})
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+
+    def _not_modified(self, etag: str) -> bool:
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return True
+        return False
+
+    def _campaigns(self, since, until, customer_id):
+        version = _current_version()
+        params = (since, until, customer_id)
+        etag = _etag(version, "/campaigns", params)
+        if self._not_modified(etag):
+            return
+
+        body = _cache.get(version, params)
+        if body is None:
+            body = json.dumps(campaign_aggregates(since, until, customer_id), ensure_ascii=False).encode("utf-8")
+            _cache.put(version, params, body)
+
+        self._send_json(200, None, body=body, etag=etag)
+
+    def _search_terms(self, since, until, customer_id, limit, after):
+        version = _current_version()
+        etag = _etag(version, "/search-terms", (since, until, customer_id, limit, after))
+        if self._not_modified(etag):
+            return
+
+        rows = search_term_page(version, since, until, customer_id, after, limit)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("ETag", etag)
+        self.end_headers()
+
+        self._write_chunk(b'{"items": [')
+        for start in range(0, len(rows), STREAM_CHUNK_ROWS):
+            items = [
+                json.dumps(
+                    {"search_term": t, "clicks": int(c or 0), "cost": round((cost_micros or 0) / 1e6, 2), "conversions": round(conv or 0.0, 2)},
+                    ensure_ascii=False,
+                )
+                for t, c, cost_micros, conv in rows[start:start + STREAM_CHUNK_ROWS]
+            ]
+            self._write_chunk((("," if start else "") + ",".join(items)).encode("utf-8"))
+
+        next_after = rows[-1][0] if len(rows) == limit else None
+        self._write_chunk(f'], "count": {len(rows)}, "next_after": {json.dumps(next_after, ensure_ascii=False)}}}'.encode("utf-8"))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+
+    def _send_json(self, status: int, payload, body: bytes | None = None, etag: str | None = None) -> None:
+        body = body if body is not None else json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(port: int = settings.api_port) -> None:
+    server = ThreadingHTTPServer(("127.0.0.1", port), ReadAPIHandler)
+    print(f"Read API listening on http://127.0.0.1:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    serve()
@@ -8,7 +8,27 @@ class Settings:
     db_path: Path = repo_root / "data.sqlite"
     ads_config_path: Path = repo_root / "google-ads.yaml"
     reports_dir: Path = repo_root / "reports"
+    cache_dir: Path = repo_root / ".cache"
+    shards_dir: Path = repo_root / "shards"
+    archive_dir: Path = repo_root / "archive"
+    db_busy_timeout_ms: int = int(os.getenv("DB_BUSY_TIMEOUT_MS", "30000"))
+    db_read_pool_size: int = int(os.getenv("DB_READ_POOL_SIZE", "4"))
+    db_mmap_bytes: int = int(os.getenv("DB_MMAP_BYTES", str(256 * 1024 * 1024)))
+    storage_layout: str = os.getenv("STORAGE_LAYOUT", "single")  # "single" or "sharded"
+    fetch_workers: int = int(os.getenv("FETCH_WORKERS", "1"))
     fetch_days: int = int(os.getenv("FETCH_DAYS", "30"))
     analysis_window_days: int = int(os.getenv("ANALYSIS_WINDOW_DAYS", "7"))
+    ads_requests_per_second: float = float(os.getenv("ADS_REQUESTS_PER_SECOND", "2"))
+    ads_max_retries: int = int(os.getenv("ADS_MAX_RETRIES", "5"))
+    ads_use_proto_plus: bool = os.getenv("ADS_USE_PROTO_PLUS", "0") == "1"  # fetchers only
+    ingest_mode: str = os.getenv("INGEST_MODE", "fingerprint")  # "fingerprint" or "upsert"
+    force_recompute: bool = os.getenv("FORCE_RECOMPUTE", "0") == "1"
+    anomaly_settle_days: int = int(os.getenv("ANOMALY_SETTLE_DAYS", "2"))
+    ollama_keep_alive: str = os.getenv("OLLAMA_KEEP_ALIVE", "")
+    daemon_interval_minutes: int = int(os.getenv("DAEMON_INTERVAL_MINUTES", "60"))
+    daemon_port: int = int(os.getenv("DAEMON_PORT", "8765"))
+    api_port: int = int(os.getenv("API_PORT", "8080"))
+    incremental_days: int = int(os.getenv("INCREMENTAL_DAYS", "3"))
+    priority_lookback_days: int = int(os.getenv("PRIORITY_LOOKBACK_DAYS", "14"))
 
 settings = Settings()
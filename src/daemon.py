@@ -0,0 +1,174 @@
+"""
+daemon.py
+
+Long-running alternative to `python -m src.run_all`.
+
+Runs the pipeline in-process on a schedule, so the Google Ads client and its
+gRPC channels (src/ads/client.py), numpy/scipy, the sentence-transformer
+(src/rag/embedding.py) and the Ollama model (kept loaded via --keepalive)
+stay warm between cycles.
+
+- The first cycle of each day re-reads the full FETCH_DAYS window (catches
+  late conversion restatements) and re-syncs MCC accounts. Later cycles only
+  fetch the last INCREMENTAL_DAYS days.
+- Analysis, LLM recommendations and RAG indexing skip themselves when their
+  inputs did not change (see src/data/versioning.py).
+- A cycle never overlaps another one: a scheduled tick or trigger that
+  arrives while a cycle is running is skipped / answered with "busy".
+
+On-demand triggers over a local TCP socket (127.0.0.1:DAEMON_PORT), one
+command per line, JSON reply:
+    run                 full cycle now
+    run <customer_id>   incremental fetch for one active client account, then
+                        downstream steps (unknown ids are rejected)
+    status              last cycle summary
+
+    python -m src.daemon
+    echo "run 1234567890" | nc 127.0.0.1 8765
+"""
+
+import json
+import socketserver
+import threading
+import time
+import traceback
+from datetime import date, datetime, timedelta
+
+from src import analysis_rules, fetch_daily_metrics, fetch_search_terms, llm_recommender
+from src.ads.scheduler import prioritize_accounts
+from src.config import settings
+from src.data.client_accounts import get_active_client_accounts
+from src.data.db import init_db, lock_wait_summary
+from src.rag import index_run
+from src.sync_client_accounts import sync_client_accounts
+
+
+class PipelineDaemon:
+    def __init__(self, interval_minutes: int = settings.daemon_interval_minutes):
+        self.interval_seconds = interval_minutes * 60
+        self._cycle_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._last_full_fetch: date | None = None
+        self._last_sync: date | None = None
+        self.last_status: dict = {"status": "idle"}
+
+    # ---------- cycle ----------
+
+    def try_run_cycle(self, customer_ids: list[str] | None = None) -> dict:
+        """Run one cycle unless another is in progress (overlap guard)."""
+        if not self._cycle_lock.acquire(blocking=False):
+            return {"status": "busy", "running_since": self.last_status.get("started_at")}
+        try:
+            return self._run_cycle(customer_ids)
+        finally:
+            self._cycle_lock.release()
+
+    def _run_cycle(self, customer_ids: list[str] | None) -> dict:
+        today = date.today()
+        started = time.perf_counter()
+        self.last_status = {"status": "running", "started_at": datetime.now().isoformat(timespec="seconds")}
+        errors = []
+
+        if self._last_sync != today and customer_ids is None:
+            try:
+                sync_client_accounts()
+                self._last_sync = today
+            except Exception as e:
+                errors.append(f"sync: {e}")
+
+        full_window = customer_ids is None and self._last_full_fetch != today
+        since = None if full_window else (today - timedelta(days=settings.incremental_days)).isoformat()
+        accounts = customer_ids or get_active_client_accounts()
+
+        changed = 0
+        for customer_id in prioritize_accounts(accounts):
+            for step in (fetch_daily_metrics, fetch_search_terms):
+                try:
+                    changed += step.main(customer_id, since).changed
+                except Exception as e:
+                    errors.append(f"{step.__name__} {customer_id}: {e}")
+
+        if full_window and not errors:
+            self._last_full_fetch = today
+
+        for name, fn in (
+            ("analysis", lambda: analysis_rules.write_output(analysis_rules.run_analysis_cached())),
+            ("llm_recommender", lambda: llm_recommender.main(keep_alive=self._keep_alive())),
+            ("rag_index", index_run.main),
+        ):
+            try:
+                fn()
+            except Exception as e:
+                errors.append(f"{name}: {e}")
+                traceback.print_exc()
+
+        self.last_status = {
+            "status": "error" if errors else "ok",
+            "started_at": self.last_status["started_at"],
+            "seconds": round(time.perf_counter() - started, 1),
+            "accounts": len(accounts),
+            "full_window": full_window,
+            "rows_changed": changed,
+            "errors": errors,
+            "lock_waits": lock_wait_summary(),
+        }
+        print(f"[daemon] cycle finished: {json.dumps(self.last_status)}")
+        return self.last_status
+
+    def _keep_alive(self) -> str:
+        # Keep the model loaded a bit longer than one scheduling interval.
+        return settings.ollama_keep_alive or f"{int(self.interval_seconds * 1.5 // 60) + 1}m"
+
+    # ---------- scheduling / triggers ----------
+
+    def run_forever(self, port: int = settings.daemon_port) -> None:
+        init_db()
+        server = socketserver.ThreadingTCPServer(("127.0.0.1", port), _make_handler(self))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"[daemon] listening on 127.0.0.1:{port}, running every {self.interval_seconds // 60} min")
+
+        try:
+            while not self._stop.is_set():
+                result = self.try_run_cycle()
+                if result["status"] == "busy":
+                    print("[daemon] previous cycle still running; skipping this tick")
+                self._stop.wait(self.interval_seconds)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.shutdown()
+            print("[daemon] stopped")
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def _is_customer_id(value: str) -> bool:
+    return value.isascii() and value.isdigit()
+
+
+def _make_handler(daemon: PipelineDaemon):
+    class TriggerHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            parts = self.rfile.readline().decode("utf-8", errors="replace").split()
+            if not parts:
+                reply = {"status": "error", "error": "empty command"}
+            elif parts[0] == "status":
+                reply = daemon.last_status
+            elif parts[0] == "run":
+                active = set(get_active_client_accounts()) if len(parts) > 1 else set()
+                unknown = [cid for cid in parts[1:] if not _is_customer_id(cid) or cid not in active]
+                if unknown:
+                    reply = {"status": "error", "error": f"not an active client account: {' '.join(unknown)}"}
+                else:
+                    reply = daemon.try_run_cycle(parts[1:] or None)
+            else:
+                reply = {"status": "error", "error": f"unknown command: {parts[0]}"}
+            self.wfile.write((json.dumps(reply) + "\n").encode("utf-8"))
+
+    return TriggerHandler
+
+
+if __name__ == "__main__":
+    PipelineDaemon().run_forever()
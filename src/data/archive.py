@@ -0,0 +1,321 @@
+"""
+Tiered storage: cold daily history in compressed, date-partitioned Parquet.
+
+    python -m src.data.archive --older-than-days 90
+
+moves campaign_daily / search_term_daily rows older than the cutoff out of
+SQLite into
+
+    archive/<table>/month=YYYY-MM/part-<scope>-<cutoff>.parquet
+
+(zstd, one file per month per run; scope is the customer id for shards or
+"all" for the single-file layout). Each run covers previous cutoff <= date <
+new cutoff. The cutoff is stored in meta as `archive_cutoff`; it is the
+boundary between tiers for readers:
+
+- hot: SQLite rows with date >= cutoff
+- cold: Parquet parts listed in the archive_parts manifest (date < cutoff)
+
+Steps run in an order that keeps readers consistent if interrupted:
+
+1) remove Parquet files that are not in the manifest (left by a run that
+   never committed),
+2) write the new parts,
+3) in one transaction, list them in the manifest and advance the cutoff,
+4) delete the hot rows below the cutoff. A run that finds nothing new to
+   archive still finishes this step for the committed cutoff.
+
+Readers never copy cold rows into SQLite. storage.connect_analytics(since)
+serves the hot rows (date >= cutoff once the window reaches the archive);
+aggregates add the archived half with add_cold_sums(), a pyarrow group-by
+over the memory-mapped month partitions overlapping the window (column
+projection and the date / account filters pushed into the scan), merged
+with the hot GROUP BY rows. Row-level readers stream the parts with
+iter_cold_rows().
+
+pyarrow is imported inside the functions that read or write Parquet.
+"""
+
+import argparse
+import os
+from datetime import date, timedelta
+
+from src.config import settings
+from src.data.db import connect, init_db, reader, write_transaction
+from src.data.ingest import CAMPAIGN_DAILY, SEARCH_TERM_DAILY
+from src.data.storage import archive_cutoff, connect_account, is_sharded, list_shards
+from src.data.versioning import bump_data_version
+
+ARCHIVED_TABLES = (CAMPAIGN_DAILY, SEARCH_TERM_DAILY)
+COLUMNS = {spec.name: spec.columns + ("row_fingerprint",) for spec in ARCHIVED_TABLES}
+
+READ_BATCH_ROWS = 50_000
+
+
+def _partition_dir(table: str, month: str):
+    return settings.archive_dir / table / f"month={month}"
+
+
+def _archive_scope(con, scope: str, previous: str | None, cutoff: str) -> list[tuple]:
+    """
+    Write rows with previous <= date < cutoff from one database to Parquet,
+    one month at a time. Returns archive_parts rows for the files written.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    lower = previous or ""
+    parts = []
+    for table, cols in COLUMNS.items():
+        months = [
+            r[0]
+            for r in con.execute(
+                f"SELECT DISTINCT substr(date, 1, 7) FROM {table} WHERE date >= ? AND date < ? ORDER BY 1",
+                (lower, cutoff),
+            )
+        ]
+
+        for month in months:
+            rows = con.execute(
+                f"SELECT {', '.join(cols)} FROM {table} WHERE date >= ? AND date < ? ORDER BY date",
+                (max(lower, f"{month}-01"), min(cutoff, _next_month(month))),
+            ).fetchall()
+            part = pa.table({c: pa.array(a) for c, a in zip(cols, zip(*rows))})
+
+            path = _partition_dir(table, month) / f"part-{scope}-{cutoff}.parquet"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            pq.write_table(part, path, compression="zstd")
+            parts.append((path.relative_to(settings.archive_dir).as_posix(), table, month, scope, cutoff, len(rows)))
+    return parts
+
+
+def _next_month(month: str) -> str:
+    y, m = map(int, month.split("-"))
+    return f"{y + m // 12:04d}-{m % 12 + 1:02d}-01"
+
+
+def _delete_hot(con, cutoff: str) -> None:
+    with write_transaction(con):
+        for table in COLUMNS:
+            con.execute(f"DELETE FROM {table} WHERE date < ?", (cutoff,))
+
+
+def _remove_uncommitted_parts() -> int:
+    """Delete Parquet files under archive_dir that the manifest does not list."""
+    with reader() as con:
+        committed = {r[0] for r in con.execute("SELECT path FROM archive_parts")}
+    removed = 0
+    for path in settings.archive_dir.glob("*/month=*/*.parquet"):
+        if path.relative_to(settings.archive_dir).as_posix() not in committed:
+            path.unlink()
+            removed += 1
+    return removed
+
+
+def archive(older_than_days: int) -> None:
+    if older_than_days <= settings.fetch_days:
+        # Rows inside the fetch window would be re-inserted into SQLite by the
+        # next fetch and be counted twice.
+        raise ValueError(f"--older-than-days must be greater than FETCH_DAYS ({settings.fetch_days}).")
+
+    init_db()
+    cutoff = (date.today() - timedelta(days=older_than_days)).isoformat()
+
+    with reader() as con:
+        previous = archive_cutoff(con)
+
+    removed = _remove_uncommitted_parts()
+    if removed:
+        print(f"Removed {removed} Parquet file(s) left by an interrupted archive run.")
+
+    scopes = [(cid, connect_account(cid)) for cid, _ in list_shards()] if is_sharded() else [("all", connect())]
+
+    if previous is not None and cutoff <= previous:
+        # Hot rows below the committed cutoff are leftovers of a run that was
+        # interrupted after advancing it; they are already in the archive.
+        for _, con in scopes:
+            _delete_hot(con, previous)
+            con.close()
+        print(f"Nothing to do: data before {previous} is already archived.")
+        return
+
+    parts = []
+    for scope, con in scopes:
+        parts.extend(_archive_scope(con, scope, previous, cutoff))
+
+    con = connect()
+    with write_transaction(con):
+        con.executemany(
+            """
+            INSERT INTO archive_parts (path, table_name, month, scope, cutoff, row_count)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(path) DO UPDATE SET row_count = excluded.row_count
+            """,
+            parts,
+        )
+        con.execute(
+            """
+            INSERT INTO meta (key, value) VALUES ('archive_cutoff', ?)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value
+            """,
+            (cutoff,),
+        )
+        bump_data_version(con)
+    con.close()
+
+    # Below the previous cutoff too, in case an earlier run stopped before this step.
+    for _, con in scopes:
+        _delete_hot(con, cutoff)
+        con.close()
+
+    totals = {t: sum(p[-1] for p in parts if p[1] == t) for t in COLUMNS}
+    print(f"Archived rows from {previous or 'the start'} to {cutoff}: " + ", ".join(f"{t}={n}" for t, n in totals.items()))
+    print("Run VACUUM on the SQLite file(s) to return the freed pages to the OS.")
+
+
+def drop_archived_account(con, customer_id: str) -> int:
+    """
+    Remove one account's archived rows; `con` is a catalog connection in the
+    caller's write transaction (it updates the manifest). The account's own
+    parts are deleted and shared ("all") parts are rewritten without its rows.
+    Returns the number of rows removed.
+    """
+    parts = con.execute(
+        "SELECT path, scope, row_count FROM archive_parts WHERE scope IN (?, 'all')", (customer_id,)
+    ).fetchall()
+    if not parts:
+        return 0
+
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    removed = 0
+    for rel, scope, n in parts:
+        path = settings.archive_dir / rel
+        if scope == customer_id:
+            path.unlink(missing_ok=True)
+            con.execute("DELETE FROM archive_parts WHERE path = ?", (rel,))
+            removed += n
+            continue
+
+        data = pq.read_table(path)
+        kept = data.filter(pc.not_equal(data["customer_id"].cast("string"), customer_id))
+        if kept.num_rows == data.num_rows:
+            continue
+        tmp = path.with_suffix(".tmp")
+        pq.write_table(kept, tmp, compression="zstd")
+        os.replace(tmp, path)
+        con.execute("UPDATE archive_parts SET row_count = ? WHERE path = ?", (kept.num_rows, rel))
+        removed += data.num_rows - kept.num_rows
+    return removed
+
+
+def _partition_files(con, table: str, since: str, cutoff: str, customer_id: str | None = None) -> list:
+    """Committed parts of `table` whose month overlaps since..cutoff (and that may hold `customer_id`)."""
+    sql = "SELECT path FROM archive_parts WHERE table_name = ? AND month BETWEEN ? AND ?"
+    params = [table, since[:7], cutoff[:7]]
+    if customer_id is not None:
+        sql += " AND scope IN (?, 'all')"
+        params.append(customer_id)
+    return [settings.archive_dir / r[0] for r in con.execute(sql + " ORDER BY path", params)]
+
+
+def iter_cold_rows(table: str, columns, since: str, cutoff: str, customer_id: str | None = None, batch_rows: int = READ_BATCH_ROWS):
+    """
+    Archived rows of `table` with since <= date < cutoff (one account if
+    `customer_id`), as lists of tuples in `columns` order, one Parquet batch
+    at a time: memory stays at one batch whatever the archive size.
+    """
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    with reader() as con:
+        paths = _partition_files(con, table, since, cutoff, customer_id)
+
+    for path in paths:
+        for batch in pq.ParquetFile(path, memory_map=True).iter_batches(batch_size=batch_rows, columns=list(columns)):
+            mask = pc.and_(pc.greater_equal(batch.column("date"), since), pc.less(batch.column("date"), cutoff))
+            if customer_id is not None:
+                mask = pc.and_(mask, pc.equal(batch.column("customer_id"), customer_id))
+            batch = batch.filter(mask)
+            if batch.num_rows:
+                yield list(zip(*(batch.column(c).to_pylist() for c in columns)))
+
+
+def cold_sums(
+    con, table: str, keys, sums, since: str, until: str | None = None, customer_id: str | None = None, zero=()
+) -> dict[tuple, list]:
+    """
+    SUM(<sums>) GROUP BY <keys> over the archived rows of `table` with
+    since <= date (<= until) below the archive cutoff, for the columns in
+    `zero` equal to 0 only, and one account if `customer_id`. The cold half of
+    an aggregate whose hot half is the same GROUP BY in SQL (add_cold_sums).
+    Runs as a pyarrow dataset scan over the memory-mapped month parts; {} when
+    the window does not reach the archive, without importing pyarrow.
+    """
+    cutoff = archive_cutoff(con)
+    if cutoff is None or since >= cutoff:
+        return {}
+    paths = _partition_files(con, table, since, cutoff, customer_id)
+    if not paths:
+        return {}
+
+    import pyarrow.dataset as ds
+    from pyarrow import fs
+
+    where = (ds.field("date") >= since) & (ds.field("date") < cutoff)
+    if until is not None:
+        where &= ds.field("date") <= until
+    if customer_id is not None:
+        where &= ds.field("customer_id") == customer_id
+    for column in zero:
+        where &= ds.field(column) == 0
+
+    parts = ds.dataset([str(p) for p in paths], format="parquet", filesystem=fs.LocalFileSystem(use_mmap=True))
+    grouped = (
+        parts.to_table(columns=list(dict.fromkeys((*keys, *sums))), filter=where)
+        .group_by(list(keys))
+        .aggregate([(c, "sum") for c in sums])
+    )
+    key_cols = [grouped.column(k).to_pylist() for k in keys]
+    sum_cols = [grouped.column(f"{c}_sum").to_pylist() for c in sums]
+    return {key: [col[i] for col in sum_cols] for i, key in enumerate(zip(*key_cols))}
+
+
+def add_cold_sums(con, rows, table: str, keys, sums, since: str, until: str | None = None, customer_id: str | None = None, zero=()) -> list:
+    """
+    Hot GROUP BY rows (the `keys` columns, then the `sums` columns) from an
+    analytics connection, with the archived sums for the same window added.
+    Groups only present in the archive are appended.
+    """
+    cold = cold_sums(con, table, keys, sums, since, until, customer_id, zero)
+    if not cold:
+        return rows
+
+    n = len(keys)
+    merged = {tuple(r[:n]): [v or 0 for v in r[n:]] for r in rows}
+    for key, values in cold.items():
+        acc = merged.setdefault(key, [0] * len(sums))
+        for i, v in enumerate(values):
+            acc[i] += v or 0
+    return [(*key, *values) for key, values in merged.items()]
+
+
+def add_cold_rows(con, rows, table: str, columns, since: str, before: str | None = None, customer_id: str | None = None) -> list:
+    """
+    Hot rows (in `columns` order) from an analytics connection, followed by
+    the archived rows with since <= date (< before) for readers that need
+    rows rather than sums.
+    """
+    cutoff = archive_cutoff(con)
+    if cutoff is None or since >= cutoff:
+        return rows
+    upper = min(cutoff, before) if before else cutoff
+    return [*rows, *(row for chunk in iter_cold_rows(table, columns, since, upper, customer_id) for row in chunk)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move cold daily history from SQLite to Parquet")
+    parser.add_argument("--older-than-days", type=int, required=True)
+    args = parser.parse_args()
+    archive(args.older_than_days)
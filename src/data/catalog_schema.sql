@@ -0,0 +1,61 @@
+-- Catalog tables: shared across accounts. In the sharded storage layout
+-- these live only in data.sqlite, while schema.sql is applied to every
+-- per-account shard (see src/data/storage.py).
+
+-- Also created by src.sync_client_accounts.ensure_table (same definition).
+CREATE TABLE IF NOT EXISTS client_accounts (
+  customer_id TEXT PRIMARY KEY,
+  descriptive_name TEXT,
+  currency_code TEXT,
+  time_zone TEXT,
+  status TEXT,
+  first_seen DATE,
+  last_seen DATE
+);
+
+CREATE INDEX IF NOT EXISTS idx_client_accounts_status
+ON client_accounts(status, customer_id);
+
+-- Small key/value store; holds data_version (bumped whenever ingestion
+-- actually changes rows).
+CREATE TABLE IF NOT EXISTS meta (
+  key TEXT PRIMARY KEY,
+  value TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS analysis_cache (
+  cache_key TEXT PRIMARY KEY,            -- hash of (data_version, mode, config, window end)
+  data_version INTEGER NOT NULL,
+  created_at TEXT NOT NULL,
+  result TEXT NOT NULL                   -- analysis JSON
+);
+
+-- Last input fingerprint consumed by each downstream step (llm, rag index).
+CREATE TABLE IF NOT EXISTS step_state (
+  step TEXT PRIMARY KEY,
+  input_key TEXT NOT NULL,
+  updated_at TEXT NOT NULL
+);
+
+-- Per-account shard files (STORAGE_LAYOUT=sharded).
+CREATE TABLE IF NOT EXISTS shards (
+  customer_id TEXT PRIMARY KEY,
+  path TEXT NOT NULL,
+  created_at TEXT NOT NULL
+);
+
+-- Parquet parts of the cold archive (see src/data/archive.py). A part is
+-- only read once it is listed here; rows are added in the same transaction
+-- that advances meta.archive_cutoff, so files left by an interrupted run are
+-- ignored (and removed by the next run).
+CREATE TABLE IF NOT EXISTS archive_parts (
+  path TEXT PRIMARY KEY,                 -- relative to settings.archive_dir
+  table_name TEXT NOT NULL,
+  month TEXT NOT NULL,                   -- YYYY-MM
+  scope TEXT NOT NULL,                   -- customer_id (sharded) or 'all'
+  cutoff TEXT NOT NULL,
+  row_count INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_archive_parts_table_month
+ON archive_parts(table_name, month);
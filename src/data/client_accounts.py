@@ -1,17 +1,42 @@
 import sqlite3
-from pathlib import Path
+from datetime import date, timedelta
 
-DB_PATH = Path("data.sqlite")
+from src.data.archive import add_cold_sums
+from src.data.db import reader
+from src.data.storage import connect_analytics
+
+ACTIVE_ACCOUNTS_SQL = """
+    SELECT customer_id
+    FROM client_accounts
+    WHERE status = 'ENABLED'
+    ORDER BY customer_id
+"""
+
+# `+customer_id`: without table statistics SQLite would rather walk the whole
+# (customer_id, date) index in GROUP BY order than range-search the date.
+RECENT_SPEND_SQL = """
+    SELECT customer_id, SUM(cost_micros)
+    FROM campaign_daily
+    WHERE date >= ?
+    GROUP BY +customer_id
+"""
 
 def get_active_client_accounts():
-    con = sqlite3.connect(DB_PATH)
-    cur = con.cursor()
-    cur.execute("""
-        SELECT customer_id
-        FROM client_accounts
-        WHERE status = 'ENABLED'
-        ORDER BY customer_id
-    """)
-    ids = [r[0] for r in cur.fetchall()]
-    con.close()
-    return ids
+    with reader() as con:
+        return [r[0] for r in con.execute(ACTIVE_ACCOUNTS_SQL)]
+
+def get_recent_spend_by_account(days: int) -> dict[str, int]:
+    """Sum of cost_micros per customer over the last `days` days of campaign_daily."""
+    since = (date.today() - timedelta(days=days)).isoformat()
+    con = connect_analytics(since)
+    try:
+        rows = add_cold_sums(
+            con, con.execute(RECENT_SPEND_SQL, (since,)).fetchall(), "campaign_daily", ("customer_id",), ("cost_micros",), since
+        )
+        spend = {r[0]: int(r[1] or 0) for r in rows}
+    except sqlite3.OperationalError:
+        # campaign_daily does not exist yet (first run)
+        spend = {}
+    finally:
+        con.close()
+    return spend
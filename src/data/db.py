@@ -1,22 +1,207 @@
+"""
+SQLite connections.
+
+Databases run in WAL mode, so readers never block on (and are never blocked
+by) an ingestion transaction, in this process or another one.
+
+- connect(): read-write connection with busy_timeout (waits instead of
+  failing with "database is locked").
+- write_transaction(con): the single writer per database file. Takes an
+  in-process lock, then BEGIN IMMEDIATE (which waits up to busy_timeout for
+  writers in other processes); commits on success, rolls back on error.
+  Keep the block short: fetchers open one per streamed batch.
+- reader(): a pooled read-only connection (query_only, mmap_size) for
+  lookups; use storage.connect_analytics() for the analysis queries.
+
+Time spent waiting for the writer lock or a pooled reader is recorded;
+lock_wait_summary() reports it and waits over LOCK_WAIT_WARN_SECONDS are
+printed as they happen.
+"""
+
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
+from queue import Empty, LifoQueue
 from src.config import settings
 
 SCHEMA_PATH = Path(__file__).resolve().parent / "schema.sql"
+CATALOG_SCHEMA_PATH = Path(__file__).resolve().parent / "catalog_schema.sql"
 RAG_SCHEMA_PATH = Path(__file__).resolve().parent / "rag_schema.sql"
 
-def connect() -> sqlite3.Connection:
-    return sqlite3.connect(settings.db_path)
+LOCK_WAIT_WARN_SECONDS = 1.0
+
+def configure(con: sqlite3.Connection, read_only: bool = False) -> sqlite3.Connection:
+    con.execute(f"PRAGMA busy_timeout = {settings.db_busy_timeout_ms}")
+    if read_only:
+        con.execute(f"PRAGMA mmap_size = {settings.db_mmap_bytes}")
+        con.execute("PRAGMA query_only = 1")
+    else:
+        con.execute("PRAGMA synchronous = NORMAL")  # durable enough with WAL, far fewer fsyncs
+    return con
+
+def enable_wal(con: sqlite3.Connection) -> None:
+    """Persistent per database file; a no-op once the file is in WAL mode."""
+    con.execute("PRAGMA journal_mode = WAL")
+
+def connect(path=None) -> sqlite3.Connection:
+    return configure(sqlite3.connect(path or settings.db_path))
+
+
+class LockWaits:
+    """Thread-safe totals of time spent waiting for database locks, per kind."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: dict[str, list] = {}   # kind -> [count, total_s, max_s]
+
+    def record(self, kind: str, seconds: float, what: str = "") -> None:
+        with self._lock:
+            stats = self._stats.setdefault(kind, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+        if seconds >= LOCK_WAIT_WARN_SECONDS:
+            print(f"Waited {seconds:.2f}s for the {kind} lock{f' ({what})' if what else ''}")
+
+    def summary(self) -> str:
+        with self._lock:
+            parts = [
+                f"{kind} n={n} total={total:.2f}s max={worst:.2f}s"
+                for kind, (n, total, worst) in sorted(self._stats.items())
+            ]
+        return "lock waits so far: " + ("; ".join(parts) if parts else "none")
+
+
+lock_waits = LockWaits()
+
+def lock_wait_summary() -> str:
+    return lock_waits.summary()
+
+
+_writer_locks: dict[str, threading.Lock] = {}
+_writer_locks_lock = threading.Lock()
+
+def _writer_lock(con: sqlite3.Connection) -> tuple[str, threading.Lock]:
+    path = con.execute("PRAGMA database_list").fetchone()[2]
+    with _writer_locks_lock:
+        if path not in _writer_locks:
+            _writer_locks[path] = threading.Lock()
+        return path, _writer_locks[path]
+
+@contextmanager
+def write_transaction(con: sqlite3.Connection, immediate: bool = True):
+    """
+    BEGIN IMMEDIATE locks every attached database (a shard's `catalog` too).
+    Blind writes that read nothing first can pass immediate=False: the
+    deferred transaction then only locks the file it actually writes.
+    """
+    path, lock = _writer_lock(con)
+    started = time.perf_counter()
+    with lock:
+        if not con.in_transaction:
+            con.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+        lock_waits.record("write", time.perf_counter() - started, Path(path).name)
+        try:
+            yield con
+        except BaseException:
+            con.rollback()
+            raise
+        con.commit()
+
+
+class ReadPool:
+    """Up to `size` read-only connections to one database file, shared across threads."""
+
+    def __init__(self, path: Path, size: int):
+        self.path = path
+        self.size = size
+        self._idle: LifoQueue = LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _open(self) -> sqlite3.Connection:
+        con = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        return configure(con, read_only=True)
+
+    @contextmanager
+    def connection(self):
+        started = time.perf_counter()
+        try:
+            con = self._idle.get_nowait()
+        except Empty:
+            with self._lock:
+                can_open = self._opened < self.size
+                self._opened += can_open
+            if can_open:
+                try:
+                    con = self._open()
+                except Exception:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+            else:
+                con = self._idle.get()
+        lock_waits.record("read", time.perf_counter() - started, self.path.name)
+        try:
+            yield con
+        finally:
+            if con.in_transaction:
+                con.rollback()
+            self._idle.put(con)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except Empty:
+                break
+        with self._lock:
+            self._opened = 0
+
+
+_read_pools: dict[str, ReadPool] = {}
+_read_pools_lock = threading.Lock()
+
+def reader(path=None):
+    """`with reader() as con:` borrows a pooled read-only connection."""
+    path = Path(path or settings.db_path)
+    with _read_pools_lock:
+        if str(path) not in _read_pools:
+            _read_pools[str(path)] = ReadPool(path, settings.db_read_pool_size)
+        pool = _read_pools[str(path)]
+    return pool.connection()
+
+# Columns added after the first release; CREATE TABLE IF NOT EXISTS won't add
+# them to an existing database.
+_ADDED_COLUMNS = [
+    ("campaign_daily", "row_fingerprint", "INTEGER"),
+    ("search_term_daily", "row_fingerprint", "INTEGER"),
+]
+
+def _migrate(con: sqlite3.Connection) -> None:
+    for table, column, decl in _ADDED_COLUMNS:
+        existing = {r[1] for r in con.execute(f"PRAGMA table_info({table})")}
+        if column not in existing:
+            con.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+def init_account_schema(con: sqlite3.Connection) -> None:
+    """Per-account tables (schema.sql). Used for data.sqlite and for shards."""
+    con.executescript(SCHEMA_PATH.read_text(encoding="utf-8"))
+    _migrate(con)
 
 def init_db() -> None:
     """
-    Initialize the SQLite database using schema.sql.
+    Initialize the SQLite database (catalog, per-account and RAG schemas).
     Safe to call multiple times (uses IF NOT EXISTS).
     """
     settings.db_path.parent.mkdir(parents=True, exist_ok=True)
 
     with connect() as con:
-        con.executescript(SCHEMA_PATH.read_text(encoding="utf-8"))
+        enable_wal(con)
+        con.executescript(CATALOG_SCHEMA_PATH.read_text(encoding="utf-8"))
+        init_account_schema(con)
         con.executescript(RAG_SCHEMA_PATH.read_text(encoding="utf-8"))
         con.commit()
 
@@ -16,3 +16,12 @@ CREATE TABLE IF NOT EXISTS rag_embeddings (
 
 CREATE INDEX IF NOT EXISTS idx_rag_documents_type_time
 ON rag_documents(doc_type, created_at);
+
+-- Search-term vectors reused across runs by src.term_clustering.
+CREATE TABLE IF NOT EXISTS term_embeddings (
+  term TEXT NOT NULL,
+  model TEXT NOT NULL,
+  dim INTEGER NOT NULL,
+  vector BLOB NOT NULL,
+  PRIMARY KEY (term, model)
+);
@@ -1,3 +1,6 @@
+-- Per-account data. Applied to data.sqlite and, with STORAGE_LAYOUT=sharded,
+-- to every per-account shard (see src/data/storage.py).
+
 CREATE TABLE IF NOT EXISTS campaign_daily (
   date TEXT NOT NULL,
   customer_id TEXT NOT NULL,
@@ -8,6 +11,7 @@ CREATE TABLE IF NOT EXISTS campaign_daily (
   cost_micros INTEGER NOT NULL,
   conversions REAL NOT NULL,
   conversions_value REAL NOT NULL,
+  row_fingerprint INTEGER,               -- hash of value columns (change detection)
   PRIMARY KEY (date, customer_id, campaign_id)
 );
 
@@ -22,5 +26,68 @@ CREATE TABLE IF NOT EXISTS search_term_daily (
   cost_micros INTEGER NOT NULL,
   conversions REAL NOT NULL,
   conversions_value REAL NOT NULL,
+  row_fingerprint INTEGER,               -- hash of value columns (change detection)
   PRIMARY KEY (date, customer_id, campaign_id, ad_group_id, search_term)
 );
+
+-- Covering indexes for the shipped analysis/reporting queries. Those
+-- queries read a recent date window out of the whole history, so the
+-- indexes lead with date: the window is one range search, and the GROUP BY
+-- over the (small) window uses a temp B-tree.
+-- Plans are checked by: python -m src.debug.explain_queries
+DROP INDEX IF EXISTS idx_campaign_daily_name_cov;
+DROP INDEX IF EXISTS idx_search_term_daily_term_cov;
+DROP INDEX IF EXISTS idx_campaign_daily_customer_date;
+
+CREATE INDEX IF NOT EXISTS idx_campaign_daily_date_cov
+ON campaign_daily(date, campaign_name, customer_id, cost_micros, conversions, conversions_value);
+
+CREATE INDEX IF NOT EXISTS idx_search_term_daily_date_cov
+ON search_term_daily(date, search_term, conversions, clicks, cost_micros);
+
+-- Per-account window lookups (ingest fingerprints, per-account exports).
+-- Not covering on purpose: cross-account aggregates must not prefer a full
+-- scan of it over the date range above.
+CREATE INDEX IF NOT EXISTS idx_campaign_daily_customer_id_date
+ON campaign_daily(customer_id, date);
+
+CREATE INDEX IF NOT EXISTS idx_search_term_daily_customer_date
+ON search_term_daily(customer_id, date);
+
+CREATE TABLE IF NOT EXISTS ingest_runs (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  step TEXT NOT NULL,                    -- target table, e.g. "campaign_daily"
+  customer_id TEXT NOT NULL,
+  finished_at TEXT NOT NULL,
+  inserted INTEGER NOT NULL,
+  updated INTEGER NOT NULL,
+  unchanged INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_ingest_runs_finished
+ON ingest_runs(finished_at);
+
+-- Running EWMA statistics per campaign and metric (src/anomaly.py).
+CREATE TABLE IF NOT EXISTS campaign_stats (
+  customer_id TEXT NOT NULL,
+  campaign_id TEXT NOT NULL,
+  metric TEXT NOT NULL,                  -- "cost", "clicks", "conversions", "roas"
+  n INTEGER NOT NULL,                    -- observations folded in
+  mean REAL NOT NULL,
+  var REAL NOT NULL,
+  last_date TEXT NOT NULL,               -- last day folded in
+  PRIMARY KEY (customer_id, campaign_id, metric)
+);
+
+CREATE TABLE IF NOT EXISTS campaign_anomalies (
+  date TEXT NOT NULL,
+  customer_id TEXT NOT NULL,
+  campaign_id TEXT NOT NULL,
+  campaign_name TEXT NOT NULL,
+  metric TEXT NOT NULL,
+  value REAL NOT NULL,
+  expected REAL NOT NULL,
+  std REAL NOT NULL,
+  z REAL NOT NULL,
+  PRIMARY KEY (date, customer_id, campaign_id, metric)
+);
@@ -0,0 +1,271 @@
+"""
+Storage layout: one shared data.sqlite (default) or one SQLite file per
+account plus data.sqlite as catalog (STORAGE_LAYOUT=sharded).
+
+Sharded layout
+- shards/<customer_id>.sqlite holds that account's rows for every table in
+  schema.sql (raw daily tables, ingest_runs, anomaly stats). Writers for
+  different accounts never share a lock, so ingestion can run in parallel.
+- data.sqlite keeps the catalog tables (catalog_schema.sql: client accounts,
+  data_version, caches, shard registry) and the RAG memory. Each shard
+  connection ATTACHes it as `catalog`, so unqualified catalog tables (e.g.
+  meta for data_version) resolve there.
+- Readers use connect_analytics(): a catalog connection where each fan-out
+  table name is a TEMP VIEW over the UNION ALL of every shard's table, so
+  the analysis/debug SQL runs unchanged (archived rows are added by the
+  callers, see archive.py). When there are more shards than SQLite
+  can ATTACH at once, the rows from `since` on are copied into TEMP tables
+  batch by batch instead, and given the same indexes as the shard tables.
+
+Dropping or re-backfilling one account only touches its shard:
+    python -m src.data.storage drop <customer_id>
+
+Rows written to data.sqlite under the single-file layout are not part of the
+fan-out; once a shard exists, readers refuse to start until they are moved:
+    python -m src.data.storage migrate
+"""
+
+import argparse
+import sqlite3
+from datetime import date, datetime
+from pathlib import Path
+
+from src.config import settings
+from src.data.db import configure, connect, enable_wal, init_account_schema, init_db, reader, write_transaction
+from src.data.versioning import bump_data_version
+
+# Tables from schema.sql that are split per account.
+FANOUT_TABLES = ("campaign_daily", "search_term_daily", "ingest_runs", "campaign_stats", "campaign_anomalies")
+
+# Raw daily tables moved to the cold archive (archive.py).
+ARCHIVED_TABLES = ("campaign_daily", "search_term_daily")
+
+# `since` for readers that need every stored day, archived ones included.
+FULL_HISTORY = "0001-01-01"
+
+
+def is_sharded() -> bool:
+    return settings.storage_layout == "sharded"
+
+
+def shard_path(customer_id: str) -> Path:
+    if not (customer_id.isascii() and customer_id.isdigit()):
+        # Interpolated into the file name: anything else could point outside shards_dir.
+        raise ValueError(f"Invalid customer id: {customer_id!r}")
+    return settings.shards_dir / f"{customer_id}.sqlite"
+
+
+def list_shards() -> list[tuple[str, Path]]:
+    with reader() as con:
+        return [(cid, Path(p)) for cid, p in con.execute("SELECT customer_id, path FROM shards ORDER BY customer_id")]
+
+
+def _register_shard(customer_id: str, path: Path) -> None:
+    con = connect()
+    with write_transaction(con):
+        con.execute(
+            """
+            INSERT INTO shards (customer_id, path, created_at) VALUES (?, ?, ?)
+            ON CONFLICT(customer_id) DO NOTHING
+            """,
+            (customer_id, str(path), datetime.now().isoformat(timespec="seconds")),
+        )
+    con.close()
+
+
+def connect_account(customer_id: str) -> sqlite3.Connection:
+    """
+    Write connection for one account's rows (the shared DB unless sharded).
+    Wrap writes in db.write_transaction(con).
+    """
+    if not is_sharded():
+        return connect()
+
+    path = shard_path(customer_id)
+    is_new = not path.exists()
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    con = connect(path)
+    enable_wal(con)
+    init_account_schema(con)
+    con.commit()
+    con.execute("ATTACH DATABASE ? AS catalog", (str(settings.db_path),))
+
+    if is_new:
+        _register_shard(customer_id, path)
+    return con
+
+
+def _attach_limit(con: sqlite3.Connection) -> int:
+    return con.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+
+
+def _fanout_views(con: sqlite3.Connection, shards: list[Path]) -> dict[str, str]:
+    for i, path in enumerate(shards):
+        con.execute(f"ATTACH DATABASE ? AS shard{i}", (str(path),))
+    for table in FANOUT_TABLES:
+        union = "\nUNION ALL\n".join(f"SELECT * FROM shard{i}.{table}" for i in range(len(shards)))
+        con.execute(f"CREATE TEMP VIEW hot_{table} AS {union}")
+    return {t: f"temp.hot_{t}" for t in FANOUT_TABLES}
+
+
+def _copy_indexes(con: sqlite3.Connection, table: str) -> None:
+    """Give temp.hot_<table> the same indexes (primary key and covering) as main.<table>."""
+    for _, name, *_ in con.execute(f"PRAGMA main.index_list({table})").fetchall():
+        cols = [r[2] for r in con.execute(f"PRAGMA main.index_info({name})")]
+        con.execute(f"CREATE INDEX temp.hot_{name.replace('sqlite_autoindex_', 'pk_')} ON hot_{table}({', '.join(cols)})")
+
+
+def _fanout_copy(con: sqlite3.Connection, shards: list[Path], batch: int, since: str | None) -> dict[str, str]:
+    """
+    More shards than ATTACH slots: copy rows with date >= `since` (everything
+    if None) into indexed TEMP tables, `batch` shards at a time.
+    """
+    dated = {t for t in FANOUT_TABLES if "date" in {r[1] for r in con.execute(f"PRAGMA main.table_info({t})")}}
+    for table in FANOUT_TABLES:
+        con.execute(f"CREATE TEMP TABLE hot_{table} AS SELECT * FROM main.{table} WHERE 0")
+
+    for start in range(0, len(shards), batch):
+        chunk = shards[start:start + batch]
+        for i, path in enumerate(chunk):
+            con.execute(f"ATTACH DATABASE ? AS shard{i}", (str(path),))
+        for table in FANOUT_TABLES:
+            where = " WHERE date >= ?" if since is not None and table in dated else ""
+            for i in range(len(chunk)):
+                con.execute(f"INSERT INTO temp.hot_{table} SELECT * FROM shard{i}.{table}{where}", (since,) if where else ())
+        con.commit()
+        for i in range(len(chunk)):
+            con.execute(f"DETACH DATABASE shard{i}")
+
+    for table in FANOUT_TABLES:
+        _copy_indexes(con, table)
+    con.commit()
+    return {t: f"temp.hot_{t}" for t in FANOUT_TABLES}
+
+
+def _has_single_file_rows(con: sqlite3.Connection, schema: str = "main") -> bool:
+    return any(con.execute(f"SELECT EXISTS (SELECT 1 FROM {schema}.{t})").fetchone()[0] for t in FANOUT_TABLES)
+
+
+def migrate_to_shards() -> None:
+    """
+    Move rows stored in data.sqlite under the single-file layout into each
+    account's shard. Rows the shard already has (fetched since the switch)
+    win; rerunning after an interruption is safe.
+    """
+    if not is_sharded():
+        raise ValueError("Set STORAGE_LAYOUT=sharded before migrating.")
+
+    with reader() as con:
+        customers = sorted({r[0] for t in FANOUT_TABLES for r in con.execute(f"SELECT DISTINCT customer_id FROM {t}")})
+
+    for customer_id in customers:
+        con = connect_account(customer_id)
+        with write_transaction(con):
+            for table in FANOUT_TABLES:
+                # ingest_runs ids are per file; let the shard assign new ones.
+                cols = ", ".join(r[1] for r in con.execute(f"PRAGMA main.table_info({table})") if r[1] != "id")
+                con.execute(
+                    f"INSERT OR IGNORE INTO main.{table} ({cols}) SELECT {cols} FROM catalog.{table} WHERE customer_id = ?",
+                    (customer_id,),
+                )
+                con.execute(f"DELETE FROM catalog.{table} WHERE customer_id = ?", (customer_id,))
+            bump_data_version(con)
+        con.close()
+        print(f"Migrated {customer_id} to {shard_path(customer_id)}")
+
+    if customers:
+        print("Run python -m src.anomaly --rebuild to recompute the running stats from the merged history.")
+
+
+def archive_cutoff(con: sqlite3.Connection) -> str | None:
+    try:
+        row = con.execute("SELECT value FROM meta WHERE key = 'archive_cutoff'").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
+
+
+def connect_analytics(since: str | None = None) -> sqlite3.Connection:
+    """
+    Read connection that sees every account's hot (SQLite) rows under the
+    usual table names, whatever the storage layout. Pass `since` (the earliest
+    date the caller reads): when it reaches past the archive cutoff, the raw
+    daily tables only show rows from the cutoff on, and callers add the
+    archived rows with archive.add_cold_sums / iter_cold_rows. Rows before
+    `since` may be left out: with more shards than ATTACH slots, only rows
+    from `since` on are copied.
+    """
+    if since is not None:
+        since = date.fromisoformat(since).isoformat()
+
+    con = configure(sqlite3.connect(settings.db_path))
+
+    cutoff = archive_cutoff(con)
+    with_cold = since is not None and cutoff is not None and since < cutoff
+
+    hot: dict[str, str] = {}
+    if is_sharded():
+        shards = [p for _, p in list_shards() if p.exists()]
+        if shards:
+            if _has_single_file_rows(con):
+                raise RuntimeError(
+                    "data.sqlite still holds rows from the single-file layout, which the sharded "
+                    "readers would skip. Run: python -m src.data.storage migrate"
+                )
+            limit = _attach_limit(con)
+            hot = _fanout_views(con, shards) if len(shards) <= limit else _fanout_copy(con, shards, limit, since)
+
+    for table in FANOUT_TABLES:
+        source = hot.get(table, f"main.{table}")
+        if with_cold and table in ARCHIVED_TABLES:
+            # Hot rows below the cutoff can only be leftovers of an interrupted
+            # archive run; the archive is authoritative for them.
+            con.execute(f"CREATE TEMP VIEW {table} AS SELECT * FROM {source} WHERE date >= '{cutoff}'")
+        elif table in hot:
+            con.execute(f"CREATE TEMP VIEW {table} AS SELECT * FROM {source}")
+
+    # Read-only from here on: the TEMP objects above are the only writes.
+    return configure(con, read_only=True)
+
+
+def drop_account(customer_id: str) -> None:
+    """
+    Delete one account's data: its shard file, or its rows in the shared DB,
+    and its rows in the cold archive.
+    """
+    from src.data.archive import drop_archived_account
+
+    con = connect()
+    with write_transaction(con):
+        archived = drop_archived_account(con, customer_id)
+        if is_sharded():
+            path = shard_path(customer_id)
+            for sidecar in ("", "-wal", "-shm"):
+                path.with_name(path.name + sidecar).unlink(missing_ok=True)
+            con.execute("DELETE FROM shards WHERE customer_id = ?", (customer_id,))
+        else:
+            for table in FANOUT_TABLES:
+                con.execute(f"DELETE FROM {table} WHERE customer_id = ?", (customer_id,))
+        bump_data_version(con)
+    con.close()
+    print(f"Dropped stored data for customer {customer_id} ({archived} archived rows).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Storage layout maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="list registered shards")
+    drop = sub.add_parser("drop", help="delete one account's stored data")
+    drop.add_argument("customer_id")
+    sub.add_parser("migrate", help="move single-file layout rows into per-account shards")
+    args = parser.parse_args()
+
+    init_db()
+    if args.command == "list":
+        for cid, path in list_shards():
+            print(f"{cid}\t{path}\t{'ok' if path.exists() else 'missing'}")
+    elif args.command == "migrate":
+        migrate_to_shards()
+    else:
+        drop_account(args.customer_id)
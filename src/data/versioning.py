@@ -0,0 +1,78 @@
+"""
+Data version counter and result memoization.
+
+Ingestion bumps `data_version` whenever it inserts or updates at least one
+row. Analysis results are cached under a key derived from the data version
+and the analysis parameters, and downstream steps (LLM recommender, RAG
+indexing) remember the input they last consumed so unchanged reruns can be
+skipped. Set FORCE_RECOMPUTE=1 to bypass all of it.
+"""
+
+import hashlib
+import json
+from datetime import datetime
+
+from src.config import settings
+
+
+def cache_key(*parts) -> str:
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_data_version(con) -> int:
+    row = con.execute("SELECT value FROM meta WHERE key = 'data_version'").fetchone()
+    return int(row[0]) if row else 0
+
+
+def bump_data_version(con) -> int:
+    con.execute(
+        """
+        INSERT INTO meta (key, value) VALUES ('data_version', '1')
+        ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+        """
+    )
+    return get_data_version(con)
+
+
+def load_cached_analysis(con, key: str) -> dict | None:
+    if settings.force_recompute:
+        return None
+    row = con.execute("SELECT result FROM analysis_cache WHERE cache_key = ?", (key,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def store_cached_analysis(con, key: str, data_version: int, result: dict) -> None:
+    con.execute(
+        """
+        INSERT INTO analysis_cache (cache_key, data_version, created_at, result)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(cache_key) DO UPDATE SET
+          data_version = excluded.data_version,
+          created_at = excluded.created_at,
+          result = excluded.result
+        """,
+        (key, data_version, datetime.now().isoformat(timespec="seconds"), json.dumps(result, ensure_ascii=False)),
+    )
+    # Entries for older data versions can never be hit again.
+    con.execute("DELETE FROM analysis_cache WHERE data_version < ?", (data_version,))
+
+
+def step_is_current(con, step: str, input_key: str) -> bool:
+    if settings.force_recompute:
+        return False
+    row = con.execute("SELECT input_key FROM step_state WHERE step = ?", (step,)).fetchone()
+    return bool(row) and row[0] == input_key
+
+
+def mark_step_done(con, step: str, input_key: str) -> None:
+    con.execute(
+        """
+        INSERT INTO step_state (step, input_key, updated_at)
+        VALUES (?, ?, ?)
+        ON CONFLICT(step) DO UPDATE SET
+          input_key = excluded.input_key,
+          updated_at = excluded.updated_at
+        """,
+        (step, input_key, datetime.now().isoformat(timespec="seconds")),
+    )
@@ -0,0 +1,181 @@
+"""
+Rows/sec benchmark for decoding search_stream batches.
+
+Compares, on the same replayed responses:
+- legacy:    proto-plus rows, per-field str()/int()/float() (the old fetch loop)
+- proto-plus: proto-plus batches through the RowDecoder (unwrapped per batch)
+- raw:       raw protobuf batches through the RowDecoder (ADS_USE_PROTO_PLUS=0)
+
+Only decoding is timed; deserializing the wire bytes happens in every mode and
+is done up front. All modes must produce identical rows.
+
+Responses come from a recording of a real stream, or are synthesized:
+    python -m src.debug.bench_decode --record 1234567890 [--query search_terms]
+    python -m src.debug.bench_decode --replay .cache/replay/search_terms-1234567890.bin
+    python -m src.debug.bench_decode --synthetic 500000
+"""
+
+import argparse
+import random
+import struct
+import time
+from datetime import date, timedelta
+from importlib import import_module
+
+from src import fetch_daily_metrics, fetch_search_terms
+from src.ads.decode import CAMPAIGN_DAILY_DECODER, SEARCH_TERM_DAILY_DECODER
+from src.config import settings
+from src.data.ingest import gaql_date_filter
+
+CUSTOMER_ID = "1234567890"
+STREAM_BATCH_ROWS = 10_000  # search_stream batch size
+
+QUERIES = {
+    "daily": (fetch_daily_metrics.QUERY, CAMPAIGN_DAILY_DECODER),
+    "search_terms": (fetch_search_terms.QUERY, SEARCH_TERM_DAILY_DECODER),
+}
+
+
+def response_type():
+    """proto-plus SearchGoogleAdsStreamResponse for the library's default API version."""
+    from google.ads.googleads import client
+
+    module = import_module(f"google.ads.googleads.{client._DEFAULT_VERSION}.services.types.google_ads_service")
+    return module.SearchGoogleAdsStreamResponse
+
+
+def legacy_rows(query: str, batch, customer_id: str) -> list[tuple]:
+    if query == "daily":
+        return [
+            (
+                str(row.segments.date),
+                customer_id,
+                str(row.campaign.id),
+                row.campaign.name,
+                int(row.metrics.impressions),
+                int(row.metrics.clicks),
+                int(row.metrics.cost_micros),
+                float(row.metrics.conversions),
+                float(row.metrics.conversions_value),
+            )
+            for row in batch.results
+        ]
+    return [
+        (
+            str(row.segments.date),
+            customer_id,
+            str(row.campaign.id),
+            str(row.ad_group.id),
+            row.search_term_view.search_term,
+            int(row.metrics.impressions),
+            int(row.metrics.clicks),
+            int(row.metrics.cost_micros),
+            float(row.metrics.conversions),
+            float(row.metrics.conversions_value),
+        )
+        for row in batch.results
+    ]
+
+
+def record(customer_id: str, query_name: str) -> None:
+    from src.ads.scheduler import search_stream
+
+    query = QUERIES[query_name][0].format(date_filter=gaql_date_filter())
+    out = settings.cache_dir / "replay" / f"{query_name}-{customer_id}.bin"
+    out.parent.mkdir(parents=True, exist_ok=True)
+
+    batches = rows = 0
+    with open(out, "wb") as f:
+        for batch in search_stream(customer_id=customer_id, query=query, raw=True):
+            data = batch.SerializeToString()
+            f.write(struct.pack("<I", len(data)))
+            f.write(data)
+            batches += 1
+            rows += len(batch.results)
+    print(f"Recorded {rows} rows in {batches} batches to {out}")
+
+
+def replay(path) -> list[bytes]:
+    payloads = []
+    with open(path, "rb") as f:
+        while header := f.read(4):
+            (size,) = struct.unpack("<I", header)
+            payloads.append(f.read(size))
+    return payloads
+
+
+def synthesize(query_name: str, n_rows: int, seed: int = 7) -> list[bytes]:
+    rng = random.Random(seed)
+    raw_type = response_type().pb()
+    start = date.today() - timedelta(days=settings.fetch_days)
+    words = ["buy", "cheap", "shoes", "near", "me", "best", "free", "running", "kids", "sale", "online", "store"]
+
+    payloads = []
+    for offset in range(0, n_rows, STREAM_BATCH_ROWS):
+        batch = raw_type()
+        for _ in range(min(STREAM_BATCH_ROWS, n_rows - offset)):
+            row = batch.results.add()
+            row.segments.date = (start + timedelta(days=rng.randrange(settings.fetch_days))).isoformat()
+            row.campaign.id = rng.randrange(10**9, 10**10)
+            if query_name == "daily":
+                row.campaign.name = f"Campaign {rng.randrange(50)}"
+            else:
+                row.ad_group.id = rng.randrange(10**9, 10**10)
+                row.search_term_view.search_term = " ".join(rng.choices(words, k=rng.randint(1, 4)))
+            row.metrics.impressions = rng.randrange(1000)
+            row.metrics.clicks = rng.randrange(50)
+            row.metrics.cost_micros = rng.randrange(10**8)
+            row.metrics.conversions = rng.random() * 3
+            row.metrics.conversions_value = rng.random() * 300
+        payloads.append(batch.SerializeToString())
+    return payloads
+
+
+def bench(query_name: str, payloads: list[bytes]) -> None:
+    proto_plus_type = response_type()
+    raw_type = proto_plus_type.pb()
+    decoder = QUERIES[query_name][1]
+
+    raw_batches = [raw_type.FromString(p) for p in payloads]
+    n_rows = sum(len(b.results) for b in raw_batches)
+
+    modes = {
+        "legacy": (lambda: [proto_plus_type.wrap(b) for b in raw_batches], lambda b: legacy_rows(query_name, b, CUSTOMER_ID)),
+        "proto-plus": (lambda: [proto_plus_type.wrap(b) for b in raw_batches], lambda b: decoder.rows(b, CUSTOMER_ID)),
+        "raw": (lambda: raw_batches, lambda b: decoder.rows(b, CUSTOMER_ID)),
+    }
+
+    print(f"{query_name}: {n_rows} rows in {len(raw_batches)} batches")
+    reference = None
+    for name, (prepare, decode) in modes.items():
+        batches = prepare()
+        started = time.perf_counter()
+        out = [row for b in batches for row in decode(b)]
+        elapsed = time.perf_counter() - started
+
+        if reference is None:
+            reference = out
+        elif out != reference:
+            raise SystemExit(f"{name}: decoded rows differ from the legacy path")
+        print(f"  {name:<11} {elapsed:7.3f}s  {n_rows / elapsed:12,.0f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--query", choices=QUERIES, default="search_terms")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--record", metavar="CUSTOMER_ID", help="record a live stream for later replay")
+    source.add_argument("--replay", metavar="PATH", help="replay a recorded stream")
+    source.add_argument("--synthetic", type=int, default=200_000, metavar="ROWS")
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.record, args.query)
+        return
+
+    payloads = replay(args.replay) if args.replay else synthesize(args.query, args.synthetic)
+    bench(args.query, payloads)
+
+
+if __name__ == "__main__":
+    main()
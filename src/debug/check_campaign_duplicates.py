@@ -1,8 +1,5 @@
-import sqlite3
-from pathlib import Path
-import pandas as pd
-
-DB_PATH = Path("data.sqlite")
+from src.config import settings
+from src.data.storage import connect_analytics
 
 QUERY = """
 SELECT
@@ -17,19 +14,23 @@ ORDER BY n DESC;
 """
 
 def main():
-    if not DB_PATH.exists():
-        raise FileNotFoundError(f"Database not found: {DB_PATH.resolve()}")
+    if not settings.db_path.exists():
+        raise FileNotFoundError(f"Database not found: {settings.db_path.resolve()}")
 
-    con = sqlite3.connect(DB_PATH)
-    df = pd.read_sql_query(QUERY, con)
+    con = connect_analytics()
+    groups = 0
+    for day, customer_id, campaign_id, n in con.execute(QUERY):
+        if groups == 0:
+            print("Duplicate rows found in campaign_daily:")
+            print(f"{'date':<10}  {'customer_id':<12}  {'campaign_id':<14}  n")
+        print(f"{day:<10}  {customer_id:<12}  {campaign_id:<14}  {n}")
+        groups += 1
     con.close()
 
-    if df.empty:
+    if groups == 0:
         print("No duplicate rows found in campaign_daily.")
     else:
-        print("Duplicate rows found in campaign_daily:")
-        print(df)
-        print(f"\nTotal duplicated groups: {len(df)}")
+        print(f"\nTotal duplicated groups: {groups}")
 
 if __name__ == "__main__":
     main()
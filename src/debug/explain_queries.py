@@ -0,0 +1,172 @@
+"""
+Query-plan regression harness for the shipped SQL.
+
+Builds a throwaway database with the real schema (indexes included), fills it
+with synthetic data at scale, then runs EXPLAIN QUERY PLAN and a timed
+execution for every query the pipeline and debug tools ship.
+
+A query fails when its plan:
+- SCANs a table or index instead of SEARCHing a range of it (a full scan of
+  a covering index still reads the table's whole history), unless the query
+  declares that it reads everything (e.g. the duplicate check), or
+- builds a temp B-tree, unless the query declares it as expected (GROUP BY
+  after a date-range search, ORDER BY on an aggregate).
+
+Usage:
+    python -m src.debug.explain_queries [--search-term-rows N] [--days N]
+Exit code 1 when any query regresses.
+"""
+
+import argparse
+import random
+import sqlite3
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from pathlib import Path
+
+from src import analysis_rules, anomaly, api, forecast, ngram_analysis
+from src.data import client_accounts, ingest
+from src.data.db import CATALOG_SCHEMA_PATH, RAG_SCHEMA_PATH, SCHEMA_PATH
+from src.debug import check_campaign_duplicates, view_data
+
+
+@dataclass(frozen=True)
+class ShippedQuery:
+    name: str
+    sql: str
+    params: tuple = ()
+    allow_temp_btree: tuple[str, ...] = ()   # e.g. ("GROUP BY", "ORDER BY")
+    allow_scan: bool = False                 # reads the whole table by design
+
+
+def shipped_queries(since: str) -> list[ShippedQuery]:
+    until = date.today().isoformat()
+    return [
+        ShippedQuery("analysis_rules.NEGATIVES_SQL", analysis_rules.NEGATIVES_SQL, (since,), ("GROUP BY",)),
+        ShippedQuery("analysis_rules.CAMPAIGN_TOTALS_SQL", analysis_rules.CAMPAIGN_TOTALS_SQL, (since,), ("GROUP BY",)),
+        ShippedQuery("ngram_analysis.TERM_METRICS_SQL", ngram_analysis.TERM_METRICS_SQL, (since,), ("GROUP BY",)),
+        ShippedQuery("anomaly.ANOMALIES_SQL", anomaly.ANOMALIES_SQL, (since,), ("ORDER BY",)),
+        ShippedQuery("forecast.FORECAST_SQL", forecast.FORECAST_SQL, (since, date.today().isoformat())),
+        ShippedQuery("client_accounts.ACTIVE_ACCOUNTS_SQL", client_accounts.ACTIVE_ACCOUNTS_SQL),
+        ShippedQuery("client_accounts.RECENT_SPEND_SQL", client_accounts.RECENT_SPEND_SQL, (since,), ("GROUP BY",)),
+        ShippedQuery(
+            "ingest.fingerprint_query(campaign_daily)",
+            ingest.fingerprint_query(ingest.CAMPAIGN_DAILY),
+            ("1000000001", since),
+        ),
+        ShippedQuery(
+            "ingest.fingerprint_query(search_term_daily)",
+            ingest.fingerprint_query(ingest.SEARCH_TERM_DAILY),
+            ("1000000001", since),
+        ),
+        ShippedQuery("api.CAMPAIGNS_SQL", api.CAMPAIGNS_SQL, (since, until), ("GROUP BY",)),
+        ShippedQuery("api.CAMPAIGNS_BY_ACCOUNT_SQL", api.CAMPAIGNS_BY_ACCOUNT_SQL, ("1000000001", since, until), ("GROUP BY",)),
+        ShippedQuery("api.SEARCH_TERMS_SQL", api.SEARCH_TERMS_SQL, (since, until), ("GROUP BY",)),
+        ShippedQuery("api.SEARCH_TERMS_BY_ACCOUNT_SQL", api.SEARCH_TERMS_BY_ACCOUNT_SQL, ("1000000001", since, until), ("GROUP BY",)),
+        ShippedQuery("debug.view_data.QUERY", view_data.QUERY, (since,), ("GROUP BY",)),
+        ShippedQuery(
+            "debug.check_campaign_duplicates.QUERY", check_campaign_duplicates.QUERY, (), ("ORDER BY",), allow_scan=True
+        ),
+    ]
+
+
+def build_synthetic_db(path: Path, days: int, customers: int, campaigns: int, search_term_rows: int) -> sqlite3.Connection:
+    con = sqlite3.connect(path)
+    con.executescript(CATALOG_SCHEMA_PATH.read_text(encoding="utf-8"))
+    con.executescript(SCHEMA_PATH.read_text(encoding="utf-8"))
+    con.executescript(RAG_SCHEMA_PATH.read_text(encoding="utf-8"))
+
+    rnd = random.Random(42)
+    dates = [(date.today() - timedelta(days=i)).isoformat() for i in range(days)]
+    customer_ids = [str(1000000000 + i) for i in range(customers)]
+
+    con.executemany(
+        "INSERT INTO client_accounts (customer_id, descriptive_name, status) VALUES (?, ?, ?)",
+        ((cid, f"Account {cid}", rnd.choice(["ENABLED", "ENABLED", "CANCELED"])) for cid in customer_ids),
+    )
+
+    con.executemany(
+        "INSERT INTO campaign_daily VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            (
+                d, cid, f"{cid}{k}", f"Campaign {cid}-{k}",
+                rnd.randrange(1000), rnd.randrange(100), rnd.randrange(50_000_000),
+                float(rnd.randrange(3)), float(rnd.randrange(300)), rnd.getrandbits(63),
+            )
+            for d in dates for cid in customer_ids for k in range(campaigns)
+        ),
+    )
+
+    vocabulary = max(1000, search_term_rows // 5)
+    con.executemany(
+        "INSERT OR IGNORE INTO search_term_daily VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            (
+                rnd.choice(dates), rnd.choice(customer_ids), str(rnd.randrange(campaigns)),
+                str(rnd.randrange(campaigns * 10)), f"search term {rnd.randrange(vocabulary)}",
+                rnd.randrange(100), rnd.randrange(10), rnd.randrange(5_000_000),
+                rnd.choice([0.0, 0.0, 0.0, 1.0]), 0.0, rnd.getrandbits(63),
+            )
+            for _ in range(search_term_rows)
+        ),
+    )
+    con.commit()
+    return con
+
+
+def plan_violations(details: list[str], allow_temp_btree: tuple[str, ...], allow_scan: bool = False) -> list[str]:
+    problems = []
+    for detail in details:
+        if detail.startswith("SCAN ") and not allow_scan:
+            problems.append(f"full scan: {detail}")
+        elif detail.startswith("USE TEMP B-TREE") and not any(a in detail for a in allow_temp_btree):
+            problems.append(f"temp b-tree: {detail}")
+    return problems
+
+
+def check_queries(con: sqlite3.Connection, queries: list[ShippedQuery]) -> int:
+    failures = 0
+    for q in queries:
+        details = [r[3] for r in con.execute("EXPLAIN QUERY PLAN " + q.sql, q.params)]
+
+        started = time.perf_counter()
+        n_rows = len(con.execute(q.sql, q.params).fetchall())
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        problems = plan_violations(details, q.allow_temp_btree, q.allow_scan)
+        failures += bool(problems)
+
+        print(f"\n[{'FAIL' if problems else 'OK'}] {q.name}  ({elapsed_ms:.1f} ms, {n_rows} rows)")
+        for d in details:
+            print(f"    {d}")
+        for p in problems:
+            print(f"    !! {p}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--customers", type=int, default=20)
+    parser.add_argument("--campaigns", type=int, default=30)
+    parser.add_argument("--search-term-rows", type=int, default=300_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        started = time.perf_counter()
+        con = build_synthetic_db(Path(tmp) / "plan_check.sqlite", args.days, args.customers, args.campaigns, args.search_term_rows)
+        print(f"Synthetic DB built in {time.perf_counter() - started:.1f}s")
+
+        since = (date.today() - timedelta(days=analysis_rules.CONFIG["LIVE"]["window_days"])).isoformat()
+        failures = check_queries(con, shipped_queries(since))
+        con.close()
+
+    if failures:
+        raise SystemExit(f"\n{failures} query plan regression(s).")
+    print("\nAll query plans OK.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Import-time budget for every `python -m src` command.
+
+Imports each command's module in a fresh interpreter with `-X importtime`
+and reports the cumulative import time plus the heaviest packages it pulled
+in. A command fails when:
+- importing it loads a heavy dependency (google-ads/gRPC, pandas,
+  sentence-transformers/torch, pyarrow); those must be imported at first
+  use, not at module import, or
+- its cumulative import time exceeds the budget.
+
+Usage:
+    python -m src.debug.import_budget [--budget-ms N] [--top N] [command ...]
+Exit code 1 when any command is over budget.
+"""
+
+import argparse
+import subprocess
+import sys
+
+from src.__main__ import COMMANDS
+from src.config import settings
+
+HEAVY_PACKAGES = ("google", "grpc", "pandas", "sentence_transformers", "torch", "transformers", "pyarrow")
+DEFAULT_BUDGET_MS = 400
+
+
+def parse_importtime(stderr: str, module: str) -> list[tuple[int, str]]:
+    """
+    (cumulative_us, dotted name) for `module` and everything imported while
+    importing it. -X importtime prints children before their parent and
+    indents by depth, so the tree is every line since the previous top-level
+    (single-space indent) line.
+    """
+    pending = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        pending.append((int(cumulative_us), name.strip()))
+        if not name.startswith("  "):
+            if name.strip() == module:
+                return pending
+            pending = []
+    return []
+
+
+def measure(module: str) -> list[tuple[int, str]]:
+    cmd = [sys.executable, "-X", "importtime", "-c", f"import {module}"]
+    # First run warms the bytecode cache so the measured run is comparable.
+    subprocess.run(cmd, cwd=settings.repo_root, capture_output=True)
+    r = subprocess.run(cmd, cwd=settings.repo_root, capture_output=True, text=True)
+    if r.returncode != 0:
+        raise RuntimeError(r.stderr.strip().splitlines()[-1])
+    return parse_importtime(r.stderr, module)
+
+
+def check_command(command: str, budget_ms: float, top: int) -> bool:
+    module, _ = COMMANDS[command]
+    try:
+        rows = measure(module)
+    except RuntimeError as e:
+        print(f"FAIL  {command:<22} import error: {e}")
+        return False
+
+    cumulative_ms = rows[-1][0] / 1000 if rows else 0.0
+    packages: dict[str, int] = {}
+    for c, name in rows:
+        package = name.split(".")[0]
+        if package != "src":
+            packages[package] = max(packages.get(package, 0), c)
+    heavy = sorted(p for p in packages if p in HEAVY_PACKAGES)
+
+    ok = not heavy and cumulative_ms <= budget_ms
+    print(f"{'ok  ' if ok else 'FAIL'}  {command:<22} {cumulative_ms:8.1f} ms  ({module})")
+    if heavy:
+        print(f"        heavy imports at module import: {', '.join(heavy)}")
+    for package, c in sorted(packages.items(), key=lambda kv: -kv[1])[:top]:
+        print(f"        {c / 1000:8.1f} ms  {package}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("commands", nargs="*", metavar="command", help="default: every command")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=3, help="heaviest top-level imports to show")
+    args = parser.parse_args()
+    unknown = [c for c in args.commands if c not in COMMANDS]
+    if unknown:
+        parser.error(f"unknown command(s): {', '.join(unknown)}")
+
+    commands = args.commands or list(COMMANDS)
+    failures = sum(not check_command(c, args.budget_ms, args.top) for c in commands)
+
+    if failures:
+        raise SystemExit(f"\n{failures} command(s) over the import budget.")
+    print("\nAll commands within the import budget.")
+
+
+if __name__ == "__main__":
+    main()
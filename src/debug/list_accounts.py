@@ -1,8 +1,7 @@
-from google.ads.googleads.client import GoogleAdsClient
+from src.ads.client import get_service
 
 def main():
-    client = GoogleAdsClient.load_from_storage("google-ads.yaml")
-    customer_service = client.get_service("CustomerService")
+    customer_service = get_service("CustomerService")
     resp = customer_service.list_accessible_customers()
     print("Accessible customers:")
     for r in resp.resource_names:
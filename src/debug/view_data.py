@@ -1,39 +1,48 @@
-import sqlite3
-import pandas as pd
+from datetime import date, timedelta
 from pathlib import Path
 
-DB_PATH = Path("data.sqlite")
-OUTPUT_PATH = Path("reports/baseline_roas_180_days.csv")
+from src.data.archive import add_cold_sums
+from src.data.storage import connect_analytics
+from src.export import RowWriter, preview
 
-con = sqlite3.connect(DB_PATH)
+OUTPUT_PATH = Path("reports/baseline_roas_180_days.csv")
 
-query = """
+QUERY = """
 SELECT
   campaign_name,
-  ROUND(SUM(cost_micros) / 1e6, 2) AS cost,
-  ROUND(SUM(conversions), 2) AS conversions,
-  ROUND(SUM(conversions_value), 2) AS conversions_value,
-  CASE
-    WHEN SUM(cost_micros) > 0
-    THEN ROUND(
-      SUM(conversions_value) / (SUM(cost_micros) / 1e6),
-      2
-    )
-    ELSE NULL
-  END AS roas
+  SUM(cost_micros) AS cost_micros,
+  SUM(conversions) AS conversions,
+  SUM(conversions_value) AS conversions_value
 FROM campaign_daily
-WHERE date >= date('now','-180 day')
+WHERE date >= ?
 GROUP BY campaign_name
-ORDER BY roas DESC;
 """
 
-df = pd.read_sql_query(query, con)
+def main():
+    since = (date.today() - timedelta(days=180)).isoformat()
+    con = connect_analytics(since)
+    rows = add_cold_sums(
+        con, con.execute(QUERY, (since,)).fetchall(),
+        "campaign_daily", ("campaign_name",), ("cost_micros", "conversions", "conversions_value"), since,
+    )
+    con.close()
+
+    baseline = []
+    for name, cost_micros, conv, conv_value in rows:
+        cost = (cost_micros or 0) / 1e6
+        roas = round((conv_value or 0.0) / cost, 2) if cost > 0 else None
+        baseline.append((name, round(cost, 2), round(conv or 0.0, 2), round(conv_value or 0.0, 2), roas))
+    baseline.sort(key=lambda r: (r[4] is None, -(r[4] or 0.0)))
 
-print("\nROAS por campanha (últimos 180 dias):")
-print(df)
+    with RowWriter(OUTPUT_PATH, ["campaign_name", "cost", "conversions", "conversions_value", "roas"]) as out:
+        out.write(baseline)
 
-df.to_csv(OUTPUT_PATH, index=False)
+    print("\nROAS por campanha (últimos 180 dias):")
+    preview(OUTPUT_PATH)
+    if out.rows > 20:
+        print(f"... ({out.rows} campanhas)")
 
-print(f"\nBaseline salvo em: {OUTPUT_PATH.resolve()}")
+    print(f"\nBaseline salvo em: {OUTPUT_PATH.resolve()}")
 
-con.close()
+if __name__ == "__main__":
+    main()
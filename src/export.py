@@ -0,0 +1,284 @@
+"""
+export.py
+
+Streaming exports of raw tables or any SQL query to CSV / NDJSON, optionally
+gzip-compressed.
+
+    python -m src.export --table search_term_daily --out reports/search_terms.csv.gz
+    python -m src.export --table campaign_daily --since 2024-01-01 --out exports/ --partition-by-account --format ndjson --gzip
+    python -m src.export --sql "SELECT * FROM campaign_daily WHERE cost_micros > ?" --param 1000000 --out big_days.csv
+
+- --table exports stream straight from the storage files, `chunk_rows` rows
+  at a time, so memory stays flat whatever the row count: archived rows
+  batch by batch from the committed Parquet parts (without --since the full
+  history is exported), then hot rows from each SQLite file's cursor
+  (data.sqlite, or every shard with STORAGE_LAYOUT=sharded).
+- --sql runs on storage.connect_analytics, which sees every account's hot
+  (SQLite) rows under the usual table names; archived rows are only exported
+  by --table. With more shards than ATTACH slots that connection copies the
+  shards' rows from --since on into memory, so such --sql exports can be
+  memory-bound.
+- --partition-by-account writes one file per customer_id into the --out
+  directory. With STORAGE_LAYOUT=sharded, raw-table partitions are exported
+  from each account's shard in parallel (FETCH_WORKERS threads, one
+  read-only connection each).
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from pathlib import Path
+
+from src.config import settings
+from src.data.db import configure, reader
+from src.data.ingest import CAMPAIGN_DAILY, SEARCH_TERM_DAILY
+from src.data.storage import FULL_HISTORY, archive_cutoff, connect_analytics, is_sharded, list_shards
+
+CHUNK_ROWS = 10_000
+FORMATS = ("csv", "ndjson")
+
+TABLES = {spec.name: spec for spec in (CAMPAIGN_DAILY, SEARCH_TERM_DAILY)}
+
+
+def infer_format(path: Path) -> tuple[str, bool]:
+    """("csv" | "ndjson", gzip) from suffixes like .csv, .ndjson, .jsonl.gz."""
+    suffixes = [s.lower() for s in path.suffixes]
+    compress = bool(suffixes) and suffixes[-1] == ".gz"
+    if compress:
+        suffixes = suffixes[:-1]
+    ext = suffixes[-1] if suffixes else ".csv"
+    return ("ndjson" if ext in (".ndjson", ".jsonl", ".json") else "csv"), compress
+
+
+class RowWriter:
+    """One CSV / NDJSON output file; rows are written as they arrive."""
+
+    def __init__(self, path: Path, columns: list[str], fmt: str = "csv", compress: bool = False):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if compress:
+            self._f = gzip.open(path, "wt", encoding="utf-8", newline="")
+        else:
+            self._f = open(path, "w", encoding="utf-8", newline="")
+        self.columns = columns
+        self.fmt = fmt
+        self.rows = 0
+        if fmt == "csv":
+            self._csv = csv.writer(self._f)
+            self._csv.writerow(columns)
+
+    def write(self, rows) -> None:
+        if self.fmt == "csv":
+            self._csv.writerows(rows)
+        else:
+            self._f.write("".join(json.dumps(dict(zip(self.columns, row)), ensure_ascii=False) + "\n" for row in rows))
+        self.rows += len(rows)
+
+    def close(self) -> None:
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def export_cursor(cur: sqlite3.Cursor, path: Path, fmt: str = "csv", compress: bool = False, chunk_rows: int = CHUNK_ROWS) -> int:
+    """Write every row of an executed cursor to `path`. Returns the row count."""
+    with RowWriter(path, [d[0] for d in cur.description], fmt, compress) as out:
+        for rows in iter(lambda: cur.fetchmany(chunk_rows), []):
+            out.write(rows)
+    return out.rows
+
+
+def export_query(con, sql: str, params: tuple, path: Path, fmt: str | None = None, compress: bool | None = None, chunk_rows: int = CHUNK_ROWS) -> int:
+    inferred_fmt, inferred_compress = infer_format(path)
+    return export_cursor(
+        con.execute(sql, params),
+        path,
+        fmt or inferred_fmt,
+        inferred_compress if compress is None else compress,
+        chunk_rows,
+    )
+
+
+def table_query(table: str, by_account: bool = False) -> str:
+    spec = TABLES[table]
+    sql = f"SELECT {', '.join(spec.columns)} FROM {table} WHERE date >= ?"
+    return sql + " AND customer_id = ?" if by_account else sql
+
+
+def _open_read_only(path: Path) -> sqlite3.Connection:
+    return configure(sqlite3.connect(f"file:{path}?mode=ro", uri=True), read_only=True)
+
+
+def table_chunks(table: str, since: str, customer_id: str | None = None, shard: Path | None = None, chunk_rows: int = CHUNK_ROWS):
+    """
+    Rows of a raw table with date >= since (one account if `customer_id`), as
+    lists of at most `chunk_rows` tuples: archived rows first, then the hot
+    rows of every SQLite file (or only `shard`).
+    """
+    with reader() as con:
+        cutoff = archive_cutoff(con)
+
+    if cutoff is not None and since < cutoff:
+        from src.data.archive import iter_cold_rows
+        yield from iter_cold_rows(table, TABLES[table].columns, since, cutoff, customer_id, chunk_rows)
+
+    # Hot rows below the cutoff can only be leftovers of an interrupted archive run.
+    hot_since = max(since, cutoff or since)
+    if shard is not None:
+        files = [shard]
+    elif is_sharded():
+        files = [p for cid, p in list_shards() if p.exists() and customer_id in (None, cid)]
+    else:
+        files = [settings.db_path]
+
+    for path in files:
+        con = _open_read_only(path)
+        try:
+            if customer_id is None:
+                cur = con.execute(table_query(table), (hot_since,))
+            else:
+                cur = con.execute(table_query(table, by_account=True), (hot_since, customer_id))
+            yield from iter(lambda: cur.fetchmany(chunk_rows), [])
+        finally:
+            con.close()
+
+
+def export_table(table: str, since: str, path: Path, fmt: str | None = None, compress: bool | None = None, chunk_rows: int = CHUNK_ROWS) -> int:
+    inferred_fmt, inferred_compress = infer_format(path)
+    fmt = fmt or inferred_fmt
+    compress = inferred_compress if compress is None else compress
+    with RowWriter(path, list(TABLES[table].columns), fmt, compress) as out:
+        for rows in table_chunks(table, since, chunk_rows=chunk_rows):
+            out.write(rows)
+    return out.rows
+
+
+def _partition_path(out_dir: Path, customer_id: str, fmt: str, compress: bool) -> Path:
+    return out_dir / f"{customer_id}.{fmt}{'.gz' if compress else ''}"
+
+
+def _export_shard(table: str, customer_id: str, shard: Path, since: str, out_dir: Path, fmt: str, compress: bool, chunk_rows: int) -> int:
+    path = _partition_path(out_dir, customer_id, fmt, compress)
+    with RowWriter(path, list(TABLES[table].columns), fmt, compress) as out:
+        for rows in table_chunks(table, since, customer_id, shard, chunk_rows):
+            out.write(rows)
+    return out.rows
+
+
+def _export_table_partitioned(table: str, since: str, out_dir: Path, fmt: str, compress: bool, chunk_rows: int) -> dict[str, int]:
+    """Single-file layout: one pass over the table, each row routed to its account's file."""
+    columns = list(TABLES[table].columns)
+    at = columns.index("customer_id")
+    writers: dict[str, RowWriter] = {}
+    try:
+        for rows in table_chunks(table, since, chunk_rows=chunk_rows):
+            by_account: dict[str, list] = {}
+            for row in rows:
+                by_account.setdefault(row[at], []).append(row)
+            for cid, account_rows in by_account.items():
+                if cid not in writers:
+                    writers[cid] = RowWriter(_partition_path(out_dir, cid, fmt, compress), columns, fmt, compress)
+                writers[cid].write(account_rows)
+    finally:
+        for w in writers.values():
+            w.close()
+    return {cid: w.rows for cid, w in writers.items()}
+
+
+def export_partitioned(
+    sql: str,
+    params: tuple,
+    since: str,
+    out_dir: Path,
+    fmt: str = "csv",
+    compress: bool = False,
+    chunk_rows: int = CHUNK_ROWS,
+    table: str | None = None,
+    workers: int | None = None,
+) -> dict[str, int]:
+    """
+    One file per customer_id under `out_dir`. For raw tables pass `table`:
+    rows are streamed from the storage files (each shard in parallel when
+    sharded). Otherwise `sql` runs on connect_analytics (hot rows only) and
+    must return a customer_id column.
+    """
+    workers = workers or settings.fetch_workers
+
+    if table and is_sharded():
+        shards = [(cid, p) for cid, p in list_shards() if p.exists()]
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            counts = pool.map(
+                lambda s: _export_shard(table, s[0], s[1], since, out_dir, fmt, compress, chunk_rows),
+                shards,
+            )
+            return dict(zip((cid for cid, _ in shards), counts))
+
+    if table:
+        return _export_table_partitioned(table, since, out_dir, fmt, compress, chunk_rows)
+
+    con = connect_analytics(since)
+    try:
+        accounts = [r[0] for r in con.execute(f"SELECT DISTINCT customer_id FROM ({sql})", params)]
+        return {
+            cid: export_query(
+                con, f"SELECT * FROM ({sql}) WHERE customer_id = ?", (*params, cid),
+                _partition_path(out_dir, cid, fmt, compress), fmt, compress, chunk_rows,
+            )
+            for cid in accounts
+        }
+    finally:
+        con.close()
+
+
+def preview(path: Path, limit: int = 20) -> None:
+    """Print the first rows of an exported CSV as an aligned table."""
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rt", encoding="utf-8", newline="") as f:
+        rows = [row for _, row in zip(range(limit + 1), csv.reader(f))]
+    if not rows:
+        return
+    widths = [max(len(r[i]) for r in rows) for i in range(len(rows[0]))]
+    for row in rows:
+        print("  ".join(v.rjust(w) for v, w in zip(row, widths)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream a table or query to CSV / NDJSON")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--table", choices=TABLES)
+    source.add_argument("--sql", help="any read query against the analytics connection (hot rows only, see module docs)")
+    parser.add_argument("--param", action="append", default=[], help="bind parameter for --sql (repeatable)")
+    parser.add_argument("--since", help="earliest date (ISO); default: full history")
+    parser.add_argument("--out", type=Path, required=True, help="output file, or directory with --partition-by-account")
+    parser.add_argument("--format", choices=FORMATS, help="default: from the --out suffix, else csv")
+    parser.add_argument("--gzip", action="store_true", default=None)
+    parser.add_argument("--partition-by-account", action="store_true")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--workers", type=int, help="parallel shard exports (default FETCH_WORKERS)")
+    args = parser.parse_args()
+
+    since = date.fromisoformat(args.since).isoformat() if args.since else FULL_HISTORY
+
+    if args.partition_by_account:
+        counts = export_partitioned(
+            args.sql, tuple(args.param), since, args.out, args.format or "csv", bool(args.gzip), args.chunk_rows, args.table, args.workers
+        )
+        print(f"Exported {sum(counts.values())} rows for {len(counts)} accounts to {args.out.resolve()}")
+    elif args.table:
+        n = export_table(args.table, since, args.out, args.format, args.gzip, args.chunk_rows)
+        print(f"Exported {n} rows to {args.out.resolve()}")
+    else:
+        con = connect_analytics(since)
+        cutoff = archive_cutoff(con)
+        if cutoff is not None and since < cutoff:
+            print(f"Note: --sql reads SQLite only; rows before {cutoff} are archived (use --table to export them).")
+        n = export_query(con, args.sql, tuple(args.param), args.out, args.format, args.gzip, args.chunk_rows)
+        con.close()
+        print(f"Exported {n} rows to {args.out.resolve()}")
@@ -1,9 +1,13 @@
-from google.ads.googleads.client import GoogleAdsClient
-from src.data.db import init_db, connect
-from src.data.client_accounts import get_active_client_accounts
+from src.ads.decode import CAMPAIGN_DAILY_DECODER
+from src.ads.scheduler import fetch_accounts, search_stream
+from src.anomaly import update_campaign_stats
 from src.config import settings
+from src.data.db import init_db, write_transaction
+from src.data.ingest import CAMPAIGN_DAILY, ChangeDetectingWriter, IngestStats, gaql_date_filter
+from src.data.client_accounts import get_active_client_accounts
+from src.data.storage import connect_account
 
-QUERY = f"""
+QUERY = """
 SELECT
   segments.date,
   campaign.id,
@@ -14,64 +18,40 @@ SELECT
   metrics.conversions,
   metrics.conversions_value
 FROM campaign
-WHERE segments.date DURING LAST_{settings.fetch_days}_DAYS
+WHERE {date_filter}
 """
 
-def main(customer_id: str):
-    init_db()
+def main(customer_id: str, since: str | None = None) -> IngestStats:
+    """
+    Fetch one account. By default the full LAST_{FETCH_DAYS}_DAYS window is
+    re-read; pass `since` (ISO date) to fetch only from that day to yesterday.
+    """
+    query = QUERY.format(date_filter=gaql_date_filter(since))
+    rows = search_stream(customer_id=customer_id, query=query, raw=not settings.ads_use_proto_plus)
 
-    client = GoogleAdsClient.load_from_storage(str(settings.ads_config_path))
-    ga_service = client.get_service("GoogleAdsService")
+    con = connect_account(customer_id)
+    try:
+        writer = ChangeDetectingWriter(con, CAMPAIGN_DAILY, customer_id, since)
 
-    rows = ga_service.search_stream(
-        customer_id=customer_id,
-        query=QUERY
-    )
-
-    with connect() as con:
-        cur = con.cursor()
+        fetched = []
 
+        # One short write transaction per batch: the write lock is never held
+        # while waiting on the API stream. The upserts are blind writes, so a
+        # deferred BEGIN only locks the shard's attached catalog when the batch
+        # changed rows and bumps data_version.
         for batch in rows:
-            for row in batch.results:
-                d = row.segments.date
+            batch_rows = CAMPAIGN_DAILY_DECODER.rows(batch, customer_id)
+            with write_transaction(con, immediate=False):
+                writer.write(batch_rows)
+            fetched.extend(batch_rows)
 
-                cur.execute(
-                    """
-                    INSERT INTO campaign_daily (
-                        date,
-                        customer_id,
-                        campaign_id,
-                        campaign_name,
-                        impressions,
-                        clicks,
-                        cost_micros,
-                        conversions,
-                        conversions_value
-                    )
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ON CONFLICT(date, customer_id, campaign_id)
-                    DO UPDATE SET
-                        campaign_name      = excluded.campaign_name,
-                        impressions        = excluded.impressions,
-                        clicks             = excluded.clicks,
-                        cost_micros        = excluded.cost_micros,
-                        conversions        = excluded.conversions,
-                        conversions_value  = excluded.conversions_value
-                    """,
-                    (
-                        str(d),
-                        customer_id,
-                        str(row.campaign.id),
-                        row.campaign.name,
-                        int(row.metrics.impressions),
-                        int(row.metrics.clicks),
-                        int(row.metrics.cost_micros),
-                        float(row.metrics.conversions),
-                        float(row.metrics.conversions_value),
-                    ),
-                )
+        with write_transaction(con):
+            stats = writer.finish()
+            update_campaign_stats(con, customer_id, fetched)
+    finally:
+        con.close()
 
-        con.commit()
+    return stats
 
 
 if __name__ == "__main__":
@@ -81,6 +61,6 @@ if __name__ == "__main__":
         print("No active client accounts found. Run: python -m src.sync_client_accounts")
         raise SystemExit(0)
 
-    for customer_id in accounts:
-        print(f"\nFetching daily metrics for customer {customer_id}")
-        main(customer_id)
+    init_db()
+    if fetch_accounts(main, accounts, "Fetching daily metrics"):
+        raise SystemExit(1)
@@ -1,9 +1,12 @@
-from google.ads.googleads.client import GoogleAdsClient
-from src.data.db import init_db, connect
-from src.data.client_accounts import get_active_client_accounts
+from src.ads.decode import SEARCH_TERM_DAILY_DECODER
+from src.ads.scheduler import fetch_accounts, search_stream
 from src.config import settings
+from src.data.db import init_db, write_transaction
+from src.data.ingest import SEARCH_TERM_DAILY, ChangeDetectingWriter, IngestStats, gaql_date_filter
+from src.data.client_accounts import get_active_client_accounts
+from src.data.storage import connect_account
 
-QUERY = f"""
+QUERY = """
 SELECT
   segments.date,
   campaign.id,
@@ -15,60 +18,33 @@ SELECT
   metrics.conversions,
   metrics.conversions_value
 FROM search_term_view
-WHERE segments.date DURING LAST_{settings.fetch_days}_DAYS
+WHERE {date_filter}
 """
 
-def main(customer_id: str):
-    init_db()
-
-    client = GoogleAdsClient.load_from_storage(str(settings.ads_config_path))
-    ga_service = client.get_service("GoogleAdsService")
+def main(customer_id: str, since: str | None = None) -> IngestStats:
+    """
+    Fetch one account. By default the full LAST_{FETCH_DAYS}_DAYS window is
+    re-read; pass `since` (ISO date) to fetch only from that day to yesterday.
+    """
+    query = QUERY.format(date_filter=gaql_date_filter(since))
+    rows = search_stream(customer_id=customer_id, query=query, raw=not settings.ads_use_proto_plus)
 
-    rows = ga_service.search_stream(customer_id=customer_id, query=QUERY)
-
-    with connect() as con:
-        cur = con.cursor()
+    con = connect_account(customer_id)
+    try:
+        writer = ChangeDetectingWriter(con, SEARCH_TERM_DAILY, customer_id, since)
 
+        # One short write transaction per batch (see fetch_daily_metrics).
         for batch in rows:
-            for row in batch.results:
-                cur.execute(
-                    """
-                    INSERT INTO search_term_daily (
-                        date,
-                        customer_id,
-                        campaign_id,
-                        ad_group_id,
-                        search_term,
-                        impressions,
-                        clicks,
-                        cost_micros,
-                        conversions,
-                        conversions_value
-                    )
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ON CONFLICT(date, customer_id, campaign_id, ad_group_id, search_term)
-                    DO UPDATE SET
-                        impressions        = excluded.impressions,
-                        clicks             = excluded.clicks,
-                        cost_micros        = excluded.cost_micros,
-                        conversions        = excluded.conversions,
-                        conversions_value  = excluded.conversions_value
-                    """,
-                    (
-                        str(row.segments.date),
-                        customer_id,
-                        str(row.campaign.id),
-                        str(row.ad_group.id),
-                        row.search_term_view.search_term,
-                        int(row.metrics.impressions),
-                        int(row.metrics.clicks),
-                        int(row.metrics.cost_micros),
-                        float(row.metrics.conversions),
-                        float(row.metrics.conversions_value),
-                    ),
-                )
+            batch_rows = SEARCH_TERM_DAILY_DECODER.rows(batch, customer_id)
+            with write_transaction(con, immediate=False):
+                writer.write(batch_rows)
+
+        with write_transaction(con):
+            stats = writer.finish()
+    finally:
+        con.close()
 
-        con.commit()
+    return stats
 
 
 if __name__ == "__main__":
@@ -77,6 +53,6 @@ if __name__ == "__main__":
         print("No active client accounts found. Run: python -m src.sync_client_accounts")
         raise SystemExit(0)
 
-    for customer_id in accounts:
-        print(f"\nFetching search terms for customer {customer_id}")
-        main(customer_id)
+    init_db()
+    if fetch_accounts(main, accounts, "Fetching search terms"):
+        raise SystemExit(1)
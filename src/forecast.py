@@ -0,0 +1,239 @@
+"""
+forecast.py
+
+Month-end spend / conversions / ROAS projection and pacing alerts for every
+campaign in campaign_daily.
+
+1) loads the daily series of all campaigns into one (metric x campaign x
+   day) array, days with no row being zero,
+2) fits y = a + b*t + weekday effects for every campaign and metric at once:
+   the design matrix only depends on the calendar, so a single least-squares
+   solve with one column per (metric, campaign) fits them all,
+3) projects the remaining days of the month (today included, since today's
+   data is still partial) and adds them to the month-to-date actuals, and
+4) compares the projection with last month's run-rate (spend scaled to this
+   month's length, ROAS) and emits pacing alerts.
+
+Campaigns with fewer than `min_active_days` spending days in the fit window
+are not projected.
+
+    python -m src.forecast   # print projections, highest spend first
+"""
+
+import calendar
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+import numpy as np
+
+from src.data.archive import add_cold_rows
+from src.data.storage import connect_analytics
+
+FORECAST_SQL = """
+SELECT
+  customer_id,
+  campaign_id,
+  campaign_name,
+  date,
+  cost_micros,
+  conversions,
+  conversions_value
+FROM campaign_daily
+WHERE date >= ? AND date < ?
+"""
+
+FORECAST_COLUMNS = ("customer_id", "campaign_id", "campaign_name", "date", "cost_micros", "conversions", "conversions_value")
+
+COST, CONV, VALUE = range(3)
+
+
+@dataclass
+class CampaignForecast:
+    """Per-campaign arrays (aligned with `keys`); metrics indexed COST/CONV/VALUE."""
+
+    today: date
+    period_end: date
+    keys: list[tuple[str, str]]      # (customer_id, campaign_id)
+    names: list[str]
+    fitted: np.ndarray               # bool, enough history to project
+    mtd: np.ndarray                  # (3, C) month-to-date actuals (through yesterday)
+    projected: np.ndarray            # (3, C) month total = mtd + forecast for the rest
+    previous: np.ndarray             # (3, C) previous calendar month actuals
+    previous_days: int
+
+    @property
+    def days_in_period(self) -> int:
+        return self.period_end.day
+
+
+def history_start(today: date, history_days: int) -> date:
+    """Earliest day needed: the fit window or the start of last month, whichever is older."""
+    previous_month = (today.replace(day=1) - timedelta(days=1)).replace(day=1)
+    return min(today - timedelta(days=history_days), previous_month)
+
+
+def design_matrix(start: date, days: int) -> np.ndarray:
+    """Columns: intercept, day index, Tuesday..Sunday dummies (Monday is the baseline)."""
+    t = np.arange(days, dtype=np.float64)
+    weekday = (start.weekday() + np.arange(days)) % 7
+    dummies = (weekday[:, None] == np.arange(1, 7)[None, :]).astype(np.float64)
+    return np.column_stack([np.ones(days), t, dummies])
+
+
+def load_series(con, start: date, today: date):
+    """
+    (keys, names, series) where series is (3, C, T) daily cost / conversions /
+    conversion value for every campaign from `start` to yesterday.
+    """
+    since, before = start.isoformat(), today.isoformat()
+    rows = add_cold_rows(con, con.execute(FORECAST_SQL, (since, before)).fetchall(), "campaign_daily", FORECAST_COLUMNS, since, before)
+    n_days = (today - start).days
+    if not rows:
+        return [], [], np.zeros((3, 0, n_days))
+
+    customer_ids, campaign_ids, names, dates, *metrics = zip(*rows)
+    key_strings = np.char.add(np.char.add(np.array(customer_ids, dtype=str), "\x1f"), np.array(campaign_ids, dtype=str))
+    unique_keys, inverse = np.unique(key_strings, return_inverse=True)
+    day = (np.array(dates, dtype="datetime64[D]") - np.datetime64(start, "D")).astype(np.int64)
+
+    series = np.zeros((3, len(unique_keys), n_days))
+    values = np.nan_to_num(np.array(metrics, dtype=np.float64))
+    values[COST] /= 1e6
+    for m in (COST, CONV, VALUE):
+        np.add.at(series[m], (inverse, day), values[m])
+
+    # Display name: the one on each campaign's latest row.
+    order = np.lexsort((day, inverse))
+    last_rows = order[np.r_[np.flatnonzero(np.diff(inverse[order])), len(order) - 1]]
+    latest_names = np.array(names, dtype=object)[last_rows]
+
+    keys = [tuple(k.split("\x1f", 1)) for k in unique_keys.tolist()]
+    return keys, latest_names.tolist(), series
+
+
+def forecast_campaigns(con, cfg: dict, today: date | None = None) -> CampaignForecast:
+    today = today or date.today()
+    history_days = int(cfg["history_days"])
+    min_active_days = int(cfg["min_active_days"])
+
+    start = history_start(today, history_days)
+    period_start = today.replace(day=1)
+    period_end = today.replace(day=calendar.monthrange(today.year, today.month)[1])
+    previous_start = (period_start - timedelta(days=1)).replace(day=1)
+
+    keys, names, series = load_series(con, start, today)
+    n_days = series.shape[2]
+    n_campaigns = len(keys)
+
+    # One least-squares solve for every (metric, campaign) column.
+    fit_from = n_days - history_days
+    x_fit = design_matrix(start + timedelta(days=fit_from), history_days)
+    y_fit = series[:, :, fit_from:].reshape(3 * n_campaigns, history_days).T
+    coef = np.linalg.lstsq(x_fit, y_fit, rcond=None)[0] if n_campaigns else np.zeros((x_fit.shape[1], 0))
+
+    # Remaining days continue the same day index as the fit window.
+    remaining = (period_end - today).days + 1
+    x_future = design_matrix(today, remaining)
+    x_future[:, 1] += history_days
+    rest = np.clip(x_future @ coef, 0.0, None).sum(axis=0).reshape(3, n_campaigns)
+
+    mtd = series[:, :, (period_start - start).days:].sum(axis=2)
+    previous = series[:, :, (previous_start - start).days:(period_start - start).days].sum(axis=2)
+    fitted = (series[COST, :, fit_from:] > 0).sum(axis=1) >= min_active_days
+
+    return CampaignForecast(
+        today=today,
+        period_end=period_end,
+        keys=keys,
+        names=names,
+        fitted=fitted,
+        mtd=mtd,
+        projected=mtd + np.where(fitted, rest, 0.0),
+        previous=previous,
+        previous_days=(period_start - previous_start).days,
+    )
+
+
+def _roas(value: np.ndarray, cost: np.ndarray) -> np.ndarray:
+    return np.divide(value, cost, out=np.zeros_like(cost), where=cost > 0)
+
+
+def pacing_alerts(con, cfg: dict, today: date | None = None) -> tuple[dict, list[dict]]:
+    """(account-wide projection summary, pacing alerts ordered by projected cost)."""
+    spend_tolerance = float(cfg["spend_tolerance"])
+    roas_tolerance = float(cfg["roas_tolerance"])
+    min_projected_cost = float(cfg["min_projected_cost"])
+
+    fc = forecast_campaigns(con, cfg, today)
+    cost, conv, value = fc.projected
+    roas = _roas(value, cost)
+    baseline_cost = fc.previous[COST] / fc.previous_days * fc.days_in_period
+    previous_roas = _roas(fc.previous[VALUE], fc.previous[COST])
+
+    eligible = fc.fitted & (cost >= min_projected_cost)
+    pace = np.divide(cost, baseline_cost, out=np.ones_like(cost), where=baseline_cost > 0) - 1.0
+    over = eligible & (baseline_cost > 0) & (pace > spend_tolerance)
+    under = eligible & (baseline_cost > 0) & (pace < -spend_tolerance)
+    roas_drop = eligible & (previous_roas > 0) & (roas < previous_roas * (1.0 - roas_tolerance))
+
+    period = fc.period_end.isoformat()
+    alerts = []
+    for kind, mask in (("PACING_OVERSPEND", over), ("PACING_UNDERSPEND", under), ("ROAS_BELOW_PACE", roas_drop)):
+        for i in np.flatnonzero(mask):
+            if kind == "ROAS_BELOW_PACE":
+                why = (
+                    f"Projected ROAS {roas[i]:.2f} by {period} vs {previous_roas[i]:.2f} last month "
+                    f"(tolerance {roas_tolerance:.0%})"
+                )
+            else:
+                why = (
+                    f"Projected spend {cost[i]:.2f} by {period} is {pace[i]:+.0%} vs last month's run-rate "
+                    f"{baseline_cost[i]:.2f} (tolerance {spend_tolerance:.0%})"
+                )
+            alerts.append(
+                {
+                    "type": kind,
+                    "customer_id": fc.keys[i][0],
+                    "campaign_id": fc.keys[i][1],
+                    "campaign": fc.names[i],
+                    "period_end": period,
+                    "mtd_cost": round(float(fc.mtd[COST, i]), 2),
+                    "projected_cost": round(float(cost[i]), 2),
+                    "baseline_cost": round(float(baseline_cost[i]), 2),
+                    "projected_conversions": round(float(conv[i]), 2),
+                    "projected_roas": round(float(roas[i]), 2),
+                    "previous_month_roas": round(float(previous_roas[i]), 2),
+                    "why": why,
+                }
+            )
+    alerts.sort(key=lambda a: -a["projected_cost"])
+
+    total_cost = float(cost[fc.fitted].sum())
+    summary = {
+        "period_end": period,
+        "campaigns_projected": int(fc.fitted.sum()),
+        "projected_cost": round(total_cost, 2),
+        "projected_conversions": round(float(conv[fc.fitted].sum()), 2),
+        "projected_roas": round(float(value[fc.fitted].sum()) / total_cost, 2) if total_cost else None,
+    }
+    return summary, alerts
+
+
+if __name__ == "__main__":
+    from src.analysis_rules import CONFIG, MODE
+
+    cfg = CONFIG[MODE]["pacing"]
+    today = date.today()
+    con = connect_analytics(history_start(today, int(cfg["history_days"])).isoformat())
+    fc = forecast_campaigns(con, cfg, today)
+    con.close()
+
+    print(f"Projection to {fc.period_end} ({int(fc.fitted.sum())}/{len(fc.keys)} campaigns with enough history)")
+    roas = _roas(fc.projected[VALUE], fc.projected[COST])
+    for i in np.argsort(-fc.projected[COST]):
+        if not fc.fitted[i]:
+            continue
+        print(
+            f"{fc.names[i][:40]:<40} cost {fc.mtd[COST, i]:>10.2f} -> {fc.projected[COST, i]:>10.2f}  "
+            f"conv {fc.projected[CONV, i]:>7.1f}  roas {roas[i]:>5.2f}"
+        )
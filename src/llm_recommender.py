@@ -5,7 +5,8 @@ from datetime import date
 from pathlib import Path
 
 from src.config import settings
-from src.rag.retrieve import retrieve_context
+from src.data.db import connect, init_db, reader, write_transaction
+from src.data.versioning import cache_key, mark_step_done, step_is_current
 
 MODEL = "llama3:8b"
 ANALYSIS_FILE = settings.repo_root / "analysis_output.json"
@@ -40,6 +41,15 @@ def _format_rag_context(items: list[dict]) -> str:
 
 
 def build_prompt(analysis: dict, rag_context: str) -> str:
+    # Clusters consolidate the per-term negatives; send only one of the two.
+    analysis = dict(analysis)
+    if analysis.get("search_term_clusters"):
+        analysis.pop("search_term_actions", None)
+        term_key = "search_term_clusters"
+    else:
+        analysis.pop("search_term_clusters", None)
+        term_key = "search_term_actions"
+
     analysis_json = json.dumps(analysis, indent=2)
 
     window_days = analysis.get("window_days", 7)
@@ -79,9 +89,15 @@ STRICT prioritization rules:
 Completeness rules:
 - You MUST cover ALL items from:
   - campaign_actions
-  - search_term_actions
+  - {term_key}
+  - ngram_actions
 - You MUST provide a detailed section for EACH item.
 - You are NOT allowed to use placeholders or omit actions.
+- `anomalies` are day-level metric shifts (not actions): cite them in the Why/Risks
+  of the affected campaign and list unexplained ones under Priority Summary.
+- `pacing_alerts` are month-end projections vs last month (not actions): mention
+  them for the affected campaign; PACING_OVERSPEND with a ROAS_BELOW_PACE alert
+  on the same campaign MUST be HIGH priority.
 
 Memory rules (RAG context):
 - You will receive past runs (summaries/recommendations).
@@ -104,7 +120,7 @@ Output format (MANDATORY — follow exactly):
 
 # Action Details
 ## [ITEM NAME]
-- Type: (Scale winner | Pause / Restructure | Add negative keyword)
+- Type: (Scale winner | Pause / Restructure | Add negative keyword(s) | Add negative n-gram (phrase match))
 - Why it matters (cite cost, conversions, ROAS from the data):
 - How to execute in Google Ads UI (step by step):
   1) ...
@@ -118,13 +134,22 @@ Input data (JSON):
 """.strip()
 
 
-def run_llm(prompt: str) -> str:
+def run_llm(prompt: str, keep_alive: str | None = None) -> str:
+    """
+    keep_alive (e.g. "2h") asks Ollama to keep the model loaded after this call,
+    so the next run skips the model load. Defaults to OLLAMA_KEEP_ALIVE.
+    """
     ollama_bin = shutil.which("ollama")
     if not ollama_bin:
         raise RuntimeError("Ollama not found in PATH. Ensure ollama is installed and available.")
 
+    cmd = [ollama_bin, "run", MODEL]
+    keep_alive = keep_alive or settings.ollama_keep_alive
+    if keep_alive:
+        cmd += ["--keepalive", keep_alive]
+
     result = subprocess.run(
-        [ollama_bin, "run", MODEL],
+        cmd,
         input=prompt,
         capture_output=True,
         text=True,
@@ -139,27 +164,45 @@ def run_llm(prompt: str) -> str:
     return result.stdout.strip()
 
 
-def main():
+def main(keep_alive: str | None = None):
     if not ANALYSIS_FILE.exists():
         raise FileNotFoundError(
             f"Missing {ANALYSIS_FILE}. Generate it first (python -m src.analysis_rules)."
         )
 
-    analysis = json.loads(ANALYSIS_FILE.read_text(encoding="utf-8"))
+    analysis_text = ANALYSIS_FILE.read_text(encoding="utf-8")
+    analysis = json.loads(analysis_text)
+
+    # Skip the (slow) LLM call when the analysis it would read is unchanged
+    # and a report for it already exists.
+    init_db()
+    input_key = cache_key(MODEL, analysis_text)
+    has_report = any(settings.reports_dir.glob("recommendations_*.md"))
+    with reader() as con:
+        if has_report and step_is_current(con, "llm_recommender", input_key):
+            print("Analysis unchanged since the last report; skipping LLM recommendations.")
+            return
 
     try:
+        from src.rag.retrieve import retrieve_context
+
         items = retrieve_context(query=RAG_QUERY, top_k=RAG_TOP_K)
         rag_context = _format_rag_context(items)
     except Exception as e:
         rag_context = f"RAG retrieval failed: {e}"
 
     prompt = build_prompt(analysis, rag_context)
-    response = run_llm(prompt)
+    response = run_llm(prompt, keep_alive)
 
     settings.reports_dir.mkdir(parents=True, exist_ok=True)
     out_md = settings.reports_dir / f"recommendations_{date.today().isoformat()}.md"
     out_md.write_text(response + "\n", encoding="utf-8")
 
+    con = connect()
+    with write_transaction(con):
+        mark_step_done(con, "llm_recommender", input_key)
+    con.close()
+
     print("\n===== LLM RECOMMENDATIONS =====\n")
     print(response)
     print(f"\nSaved report to: {out_md.resolve()}")
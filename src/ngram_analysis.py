@@ -0,0 +1,292 @@
+"""
+ngram_analysis.py
+
+N-gram level waste analysis over search_term_daily.
+
+Spend on a bad modifier ("free", "reviews", "scam") is usually spread across
+thousands of long-tail variants, none of which clears the per-term negative
+thresholds on its own. This module:
+
+1) aggregates clicks/cost/conversions per search term in the window (one
+   indexed GROUP BY),
+2) tokenizes each distinct term into 1..max_n word n-grams, caching the
+   term x n-gram incidence matrix on disk (compressed, pruned to the window
+   when it grows) so only unseen terms are tokenized on later runs,
+3) aggregates metrics per n-gram with a single sparse product
+   (M.T @ metrics), and
+4) emits n-gram negative keyword candidates: zero conversions across every
+   term containing the n-gram, spread over at least `min_terms` terms, and
+   above the click/cost thresholds.
+
+scipy.sparse is imported on first use (it dominates the import time of the
+analysis step otherwise).
+"""
+
+import re
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from src.config import settings
+from src.data.archive import add_cold_sums
+
+if TYPE_CHECKING:
+    import scipy.sparse as sp
+
+TOKENIZER_VERSION = 1
+CACHE_FORMAT = 2
+CACHE_PATH = settings.cache_dir / "search_term_ngrams.npz"
+
+# Terms outside the current window are dropped once the cache holds more than
+# this many times the window's terms.
+PRUNE_RATIO = 2
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# N-grams made only of these are never candidates ("for the", "de", ...).
+STOPWORDS = frozenset(
+    """
+    a an and are at be by for from in is it of on or the to with
+    o os as um uma e de da do das dos em no na nos nas para por com que
+    """.split()
+)
+
+TERM_METRICS_SQL = """
+SELECT
+  search_term,
+  SUM(clicks) AS clicks,
+  SUM(cost_micros) AS cost_micros,
+  SUM(conversions) AS conv
+FROM search_term_daily
+WHERE date >= ?
+GROUP BY search_term
+"""
+
+
+def tokenize(term: str, max_n: int) -> list[str]:
+    tokens = _TOKEN_RE.findall(term.lower())
+    grams = set()
+    for n in range(1, max_n + 1):
+        for i in range(len(tokens) - n + 1):
+            gram = tokens[i:i + n]
+            if all(t in STOPWORDS for t in gram):
+                continue
+            grams.add(" ".join(gram))
+    return sorted(grams)
+
+
+def _pack_terms(terms: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """UTF-8 term array -> (concatenated bytes, offsets): no per-term padding on disk."""
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    np.cumsum(np.char.str_len(terms), out=offsets[1:])
+    return np.frombuffer(b"".join(terms.tolist()), dtype=np.uint8), offsets
+
+
+def _unpack_terms(data: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    lengths = np.diff(offsets)
+    if len(data) == 0:
+        return np.zeros(len(lengths), dtype="S1")
+    width = int(lengths.max(initial=1)) or 1
+    cols = np.arange(width)
+    grid = np.where(cols < lengths[:, None], data[np.minimum(offsets[:-1, None] + cols, len(data) - 1)], 0)
+    return np.ascontiguousarray(grid, dtype=np.uint8).view(f"S{width}").ravel()
+
+
+class NgramIndex:
+    """
+    Term x n-gram incidence matrix (CSR, binary) with on-disk caching.
+
+    Terms are held as UTF-8 bytes and looked up with a vectorized binary
+    search over a stored sort order, so mapping millions of window terms onto
+    cached rows needs no per-term Python dict work. On disk they are one
+    UTF-8 buffer plus offsets (np.savez_compressed). Once the cache holds more
+    than PRUNE_RATIO times the window's terms, it is pruned to the window.
+    """
+
+    def __init__(self, max_n: int, terms=None, vocab=None, matrix=None, order=None):
+        import scipy.sparse as sp
+
+        self.max_n = max_n
+        self.terms = np.asarray(terms if terms is not None else [], dtype=bytes)
+        self.vocab: list[str] = list(vocab) if vocab is not None else []
+        self.matrix = matrix if matrix is not None else sp.csr_matrix((0, 0), dtype=np.float32)
+        self.order = order if order is not None else np.argsort(self.terms, kind="stable")
+        self.dirty = False
+
+    @classmethod
+    def load(cls, max_n: int, path=CACHE_PATH) -> "NgramIndex":
+        import scipy.sparse as sp
+
+        if not path.exists():
+            return cls(max_n)
+        with np.load(path, allow_pickle=False) as z:
+            if (
+                "cache_format" not in z.files
+                or int(z["cache_format"]) != CACHE_FORMAT
+                or int(z["tokenizer_version"]) != TOKENIZER_VERSION
+                or int(z["max_n"]) != max_n
+            ):
+                return cls(max_n)
+            terms = _unpack_terms(z["term_bytes"], z["term_offsets"])
+            vocab = z["vocab"].tobytes().decode("utf-8").split("\n") if len(z["vocab"]) else []
+            matrix = sp.csr_matrix(
+                (np.ones(len(z["indices"]), dtype=np.float32), z["indices"], z["indptr"]),
+                shape=(len(terms), len(vocab)),
+            )
+            return cls(max_n, terms, vocab, matrix, z["order"])
+
+    def save(self, path=CACHE_PATH) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        term_bytes, term_offsets = _pack_terms(self.terms)
+        np.savez_compressed(
+            path,
+            cache_format=CACHE_FORMAT,
+            tokenizer_version=TOKENIZER_VERSION,
+            max_n=self.max_n,
+            term_bytes=term_bytes,
+            term_offsets=term_offsets,
+            order=self.order,
+            # n-grams are \w+ tokens joined by spaces, so newline-separated is unambiguous
+            vocab=np.frombuffer("\n".join(self.vocab).encode("utf-8"), dtype=np.uint8),
+            indptr=self.matrix.indptr.astype(np.int64),
+            indices=self.matrix.indices.astype(np.int32),
+        )
+        self.dirty = False
+
+    def _lookup(self, terms: np.ndarray) -> np.ndarray:
+        """Row index of each term in the cache, -1 where unseen."""
+        if len(self.terms) == 0:
+            return np.full(len(terms), -1, dtype=np.int64)
+        pos = np.searchsorted(self.terms, terms, sorter=self.order)
+        rows = self.order[np.minimum(pos, len(self.order) - 1)]
+        return np.where(self.terms[rows] == terms, rows, -1)
+
+    def _add_terms(self, new_terms: list[str]) -> None:
+        import scipy.sparse as sp
+
+        gram_pos = {g: i for i, g in enumerate(self.vocab)}
+        indptr = [0]
+        indices = []
+        for term in new_terms:
+            for gram in tokenize(term, self.max_n):
+                col = gram_pos.get(gram)
+                if col is None:
+                    col = gram_pos[gram] = len(self.vocab)
+                    self.vocab.append(gram)
+                indices.append(col)
+            indptr.append(len(indices))
+
+        new_rows = sp.csr_matrix(
+            (np.ones(len(indices), dtype=np.float32), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+            shape=(len(new_terms), len(self.vocab)),
+        )
+        old = self.matrix
+        old.resize((old.shape[0], len(self.vocab)))
+        self.matrix = sp.vstack([old, new_rows], format="csr")
+        self.terms = np.concatenate([self.terms, np.asarray([t.encode("utf-8") for t in new_terms], dtype=bytes)])
+        self.order = np.argsort(self.terms, kind="stable")
+        self.dirty = True
+
+    def _prune(self, keep: np.ndarray) -> None:
+        """Keep only rows `keep` and the n-grams they contain (renumbering the vocabulary)."""
+        import scipy.sparse as sp
+
+        keep = np.unique(keep)
+        matrix = self.matrix[keep]
+        used = np.unique(matrix.indices)
+        column = np.full(len(self.vocab), -1, dtype=np.int32)
+        column[used] = np.arange(len(used), dtype=np.int32)
+        self.matrix = sp.csr_matrix((matrix.data, column[matrix.indices], matrix.indptr), shape=(len(keep), len(used)))
+        self.vocab = [self.vocab[i] for i in used]
+        self.terms = self.terms[keep]
+        self.order = np.argsort(self.terms, kind="stable")
+        self.dirty = True
+
+    def rows_for(self, terms: list[str]) -> "sp.csr_matrix":
+        """Incidence rows for `terms` (tokenizing only terms not seen before)."""
+        arr = np.asarray([t.encode("utf-8") for t in terms], dtype=bytes)
+        rows = self._lookup(arr)
+        if (rows < 0).any():
+            self._add_terms([t.decode("utf-8") for t in dict.fromkeys(arr[rows < 0].tolist())])
+            rows = self._lookup(arr)
+        if len(self.terms) > PRUNE_RATIO * len(arr):
+            self._prune(rows)
+            rows = self._lookup(arr)
+        return self.matrix[rows]
+
+
+def find_ngram_negatives(con, since: str, cfg: dict, window_days: int) -> list[dict]:
+    max_n = int(cfg["max_n"])
+    min_terms = int(cfg["min_terms"])
+    min_clicks = int(cfg["min_clicks"])
+    min_cost = float(cfg["min_cost"])
+    max_candidates = int(cfg["max_candidates"])
+
+    rows = add_cold_sums(
+        con, con.execute(TERM_METRICS_SQL, (since,)).fetchall(),
+        "search_term_daily", ("search_term",), ("clicks", "cost_micros", "conversions"), since,
+    )
+    if not rows:
+        return []
+
+    terms, *cols = zip(*rows)
+    metrics = np.nan_to_num(np.array(cols, dtype=np.float64).T)
+    metrics[:, 1] /= 1e6  # cost_micros -> cost
+
+    index = NgramIndex.load(max_n)
+    m = index.rows_for(terms)
+    if index.dirty:
+        index.save()
+
+    # n-gram aggregates: clicks, cost, conversions, and how many terms contain it
+    agg = np.asarray(m.T @ metrics)
+    n_terms = np.asarray(m.sum(axis=0)).ravel()
+
+    clicks, cost, conv = agg[:, 0], agg[:, 1], agg[:, 2]
+    mask = (conv == 0) & (clicks >= min_clicks) & (cost >= min_cost) & (n_terms >= min_terms)
+    cols = np.flatnonzero(mask)
+    if cols.size == 0:
+        return []
+
+    # Shorter n-grams first (they cover a superset of terms), then by cost.
+    vocab = index.vocab
+    cols = sorted(cols, key=lambda c: (vocab[c].count(" "), -cost[c]))
+
+    emitted: set[str] = set()
+    selected = []
+    for c in cols:
+        gram = vocab[c]
+        tokens = gram.split()
+        subgrams = {
+            " ".join(tokens[i:i + n])
+            for n in range(1, len(tokens))
+            for i in range(len(tokens) - n + 1)
+        }
+        if subgrams & emitted:
+            continue
+        emitted.add(gram)
+        selected.append(c)
+
+    selected.sort(key=lambda c: -cost[c])
+    selected = selected[:max_candidates]
+
+    mc = m.tocsc()
+    actions = []
+    for c in selected:
+        members = mc.indices[mc.indptr[c]:mc.indptr[c + 1]]
+        top = members[np.argsort(-metrics[members, 1])[:3]]
+        actions.append(
+            {
+                "type": "ADD_NEGATIVE_NGRAM",
+                "ngram": vocab[c],
+                "terms": int(n_terms[c]),
+                "clicks": int(clicks[c]),
+                "cost": round(float(cost[c]), 2),
+                "example_terms": [terms[i] for i in top],
+                "why": (
+                    f"Zero conversions across {int(n_terms[c])} search terms containing this n-gram in last {window_days} days "
+                    f"(thresholds: terms>={min_terms}, clicks>={min_clicks}, cost>={min_cost})"
+                ),
+            }
+        )
+    return actions
@@ -1,12 +1,18 @@
+from typing import TYPE_CHECKING
+
 import numpy as np
-from sentence_transformers import SentenceTransformer
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
 
 _DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 
-_model_cache: dict[str, SentenceTransformer] = {}
+# sentence-transformers (and torch) load on the first get_model() call.
+_model_cache: dict[str, "SentenceTransformer"] = {}
 
-def get_model(model_name: str = _DEFAULT_MODEL) -> SentenceTransformer:
+def get_model(model_name: str = _DEFAULT_MODEL) -> "SentenceTransformer":
     if model_name not in _model_cache:
+        from sentence_transformers import SentenceTransformer
         _model_cache[model_name] = SentenceTransformer(model_name)
     return _model_cache[model_name]
 
@@ -17,3 +23,9 @@ def embed_text(text: str, model_name: str = _DEFAULT_MODEL) -> np.ndarray:
 
 def cosine_sim(a: np.ndarray, b: np.ndarray) -> float:
     return float(np.dot(a, b))
+
+def embed_texts(texts: list[str], model_name: str = _DEFAULT_MODEL, batch_size: int = 64) -> np.ndarray:
+    """Batch-encode `texts` into an (n, dim) float32 matrix of unit vectors."""
+    model = get_model(model_name)
+    vecs = model.encode(texts, batch_size=batch_size, normalize_embeddings=True)
+    return np.asarray(vecs, dtype=np.float32).reshape(len(texts), -1)
@@ -2,7 +2,8 @@ import json
 from datetime import date
 
 from src.config import settings
-from src.data.db import connect, init_db
+from src.data.db import connect, init_db, reader, write_transaction
+from src.data.versioning import cache_key, mark_step_done, step_is_current
 from src.rag.embedding import embed_text
 
 EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
@@ -39,6 +40,9 @@ def build_run_summary(analysis: dict, recommendations_text: str) -> str:
     window_days = analysis.get("window_days")
     actions_c = analysis.get("campaign_actions", [])
     actions_s = analysis.get("search_term_actions", [])
+    actions_n = analysis.get("ngram_actions", [])
+    clusters = analysis.get("search_term_clusters", [])
+    pacing = analysis.get("pacing_alerts", [])
 
     top_campaigns = []
     for a in actions_c[:8]:
@@ -47,6 +51,8 @@ def build_run_summary(analysis: dict, recommendations_text: str) -> str:
     top_terms = []
     for a in actions_s[:8]:
         top_terms.append(f"- {a.get('type')}: {a.get('search_term')} (clicks={a.get('clicks')}, cost={a.get('cost')})")
+    for a in actions_n[:8]:
+        top_terms.append(f"- {a.get('type')}: {a.get('ngram')} (terms={a.get('terms')}, clicks={a.get('clicks')}, cost={a.get('cost')})")
 
     rec_head = recommendations_text.strip().splitlines()[:40]
     rec_head_text = "\n".join(rec_head)
@@ -58,6 +64,9 @@ window_days: {window_days}
 
 campaign_actions: {len(actions_c)}
 search_term_actions: {len(actions_s)}
+ngram_actions: {len(actions_n)}
+search_term_clusters: {len(clusters)}
+pacing_alerts: {len(pacing)}
 
 TOP CAMPAIGN ACTIONS
 {chr(10).join(top_campaigns) if top_campaigns else "- (none)"}
@@ -81,23 +90,36 @@ def main():
         raise FileNotFoundError(f"No recommendations found in {settings.reports_dir}. Run llm_recommender first.")
     rec_path = reports[0]
 
-    analysis = json.loads(analysis_path.read_text(encoding="utf-8"))
+    analysis_text = analysis_path.read_text(encoding="utf-8")
+    analysis = json.loads(analysis_text)
     rec_text = rec_path.read_text(encoding="utf-8")
 
+    input_key = cache_key(EMBED_MODEL, analysis_text, rec_path.name, rec_text)
+    with reader() as con:
+        if step_is_current(con, "rag_index", input_key):
+            print("Analysis and recommendations already indexed; skipping RAG indexing.")
+            return
+
     run_summary = build_run_summary(analysis, rec_text)
     created_at = date.today().isoformat()
 
-    with connect() as con:
+    # Embed before taking the write lock.
+    summary_vec = embed_text(run_summary, EMBED_MODEL)
+    rec_vec = embed_text(rec_text[:8000], EMBED_MODEL)
+
+    con = connect()
+    with write_transaction(con):
         analysis_doc_id = _insert_document(con, "analysis", str(analysis_path), json.dumps(analysis, ensure_ascii=False, indent=2), created_at)
-        _upsert_embedding(con, analysis_doc_id, EMBED_MODEL, embed_text(run_summary, EMBED_MODEL))
+        _upsert_embedding(con, analysis_doc_id, EMBED_MODEL, summary_vec)
 
         rec_doc_id = _insert_document(con, "recommendations", str(rec_path), rec_text, created_at)
-        _upsert_embedding(con, rec_doc_id, EMBED_MODEL, embed_text(rec_text[:8000], EMBED_MODEL))
+        _upsert_embedding(con, rec_doc_id, EMBED_MODEL, rec_vec)
 
         summary_doc_id = _insert_document(con, "run_summary", f"run:{created_at}", run_summary, created_at)
-        _upsert_embedding(con, summary_doc_id, EMBED_MODEL, embed_text(run_summary, EMBED_MODEL))
+        _upsert_embedding(con, summary_doc_id, EMBED_MODEL, summary_vec)
 
-        con.commit()
+        mark_step_done(con, "rag_index", input_key)
+    con.close()
 
     print(f"Indexed run into RAG: analysis={analysis_doc_id}, recommendations={rec_doc_id}, summary={summary_doc_id}")
 
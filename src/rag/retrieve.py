@@ -1,5 +1,5 @@
 import numpy as np
-from src.data.db import connect
+from src.data.db import reader
 from src.rag.embedding import embed_text, cosine_sim
 
 EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
@@ -10,7 +10,7 @@ def _blob_to_vec(blob: bytes, dim: int) -> np.ndarray:
 def retrieve_context(query: str, top_k: int = 5, doc_types: tuple[str, ...] = ("run_summary", "recommendations")) -> list[dict]:
     qv = embed_text(query, EMBED_MODEL)
 
-    with connect() as con:
+    with reader() as con:
         cur = con.cursor()
         cur.execute(
             """
@@ -1,10 +1,8 @@
-from google.ads.googleads.client import GoogleAdsClient
-import sqlite3
-from pathlib import Path
+from src.ads.client import get_client
+from src.ads.scheduler import search_stream
+from src.data.db import connect, write_transaction
 from datetime import date
 
-DB_PATH = Path("data.sqlite")
-
 QUERY = """
 SELECT
   customer_client.id,
@@ -32,7 +30,7 @@ def ensure_table(conn):
     conn.commit()
 
 
-def get_login_customer_id(client: GoogleAdsClient) -> str:
+def get_login_customer_id(client) -> str:
     """
     Extracts login_customer_id (MCC) from google-ads.yaml via the client config.
     """
@@ -46,29 +44,39 @@ def get_login_customer_id(client: GoogleAdsClient) -> str:
 
 
 def sync_client_accounts():
-    client = GoogleAdsClient.load_from_storage("google-ads.yaml")
-    ga_service = client.get_service("GoogleAdsService")
+    client = get_client()
 
     mcc_customer_id = get_login_customer_id(client)
 
-    conn = sqlite3.connect(DB_PATH)
+    conn = connect()
     ensure_table(conn)
-    cur = conn.cursor()
 
     today = date.today().isoformat()
     found_ids = set()
+    rows = []
 
-    response = ga_service.search_stream(
+    response = search_stream(
         customer_id=mcc_customer_id,
         query=QUERY
     )
 
+    # Read the whole stream first so the write lock is only held for the upsert.
     for batch in response:
         for row in batch.results:
             cid = str(row.customer_client.id)
             found_ids.add(cid)
+            rows.append((
+                cid,
+                row.customer_client.descriptive_name,
+                row.customer_client.currency_code,
+                row.customer_client.time_zone,
+                row.customer_client.status.name,
+                today,
+                today
+            ))
 
-            cur.execute("""
+    with write_transaction(conn):
+        conn.executemany("""
                 INSERT INTO client_accounts (
                     customer_id,
                     descriptive_name,
@@ -85,17 +93,8 @@ def sync_client_accounts():
                     time_zone = excluded.time_zone,
                     status = excluded.status,
                     last_seen = excluded.last_seen
-            """, (
-                cid,
-                row.customer_client.descriptive_name,
-                row.customer_client.currency_code,
-                row.customer_client.time_zone,
-                row.customer_client.status.name,
-                today,
-                today
-            ))
+            """, rows)
 
-    conn.commit()
     conn.close()
 
     print(f"Synced {len(found_ids)} client accounts from MCC {mcc_customer_id}.")
@@ -0,0 +1,109 @@
+"""
+term_clustering.py
+
+Groups near-duplicate negative keyword candidates so the LLM writes one
+section per cluster instead of one per search term.
+
+- Candidate terms are batch-embedded with the RAG embedding model; vectors
+  are cached in term_embeddings, so only new terms are encoded. Reading the
+  cache and encoding need no write lock: the new vectors are returned and the
+  caller stores them (store_term_vectors) in its own short transaction.
+- Clustering is greedy leader clustering over unit vectors: terms are
+  visited by cost (highest first); each unassigned term becomes a leader and
+  absorbs every unassigned term whose cosine similarity is >= min_similarity
+  (one matrix-vector product per leader).
+- Each cluster becomes a single ADD_NEGATIVE_CLUSTER action with aggregated
+  cost and clicks and its member terms.
+"""
+
+import numpy as np
+
+from src.rag.embedding import embed_texts
+
+EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+_SQLITE_MAX_PARAMS = 500
+
+
+def _load_cached_vectors(con, terms: list[str]) -> dict[str, np.ndarray]:
+    cached = {}
+    for i in range(0, len(terms), _SQLITE_MAX_PARAMS):
+        chunk = terms[i:i + _SQLITE_MAX_PARAMS]
+        cur = con.execute(
+            "SELECT term, dim, vector FROM term_embeddings WHERE model = ? AND term IN ({})".format(
+                ",".join("?" for _ in chunk)
+            ),
+            (EMBED_MODEL, *chunk),
+        )
+        for term, dim, blob in cur:
+            cached[term] = np.frombuffer(blob, dtype=np.float32, count=int(dim))
+    return cached
+
+
+def store_term_vectors(con, vectors: dict[str, np.ndarray]) -> None:
+    con.executemany(
+        """
+        INSERT INTO term_embeddings (term, model, dim, vector)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(term, model) DO UPDATE SET
+          dim = excluded.dim,
+          vector = excluded.vector
+        """,
+        ((t, EMBED_MODEL, int(v.shape[0]), v.tobytes()) for t, v in vectors.items()),
+    )
+
+
+def embed_terms(con, terms: list[str]) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    """
+    ((n, dim) unit vectors for `terms`, {term: vector} for the terms that had
+    to be encoded). `con` is only read.
+    """
+    cached = _load_cached_vectors(con, terms)
+    missing = [t for t in dict.fromkeys(terms) if t not in cached]
+
+    new = dict(zip(missing, embed_texts(missing, EMBED_MODEL))) if missing else {}
+    cached.update(new)
+    return np.vstack([cached[t] for t in terms]), new
+
+
+def leader_clusters(vectors: np.ndarray, min_similarity: float) -> np.ndarray:
+    """Cluster label (index of the leader row) for each row; rows must be in priority order."""
+    labels = np.full(len(vectors), -1, dtype=np.int64)
+    for i in range(len(vectors)):
+        if labels[i] >= 0:
+            continue
+        free = np.flatnonzero(labels < 0)
+        sims = vectors[free] @ vectors[i]
+        labels[free[sims >= min_similarity]] = i
+    return labels
+
+
+def cluster_search_term_actions(con, actions: list[dict], min_similarity: float) -> tuple[list[dict], dict[str, np.ndarray]]:
+    """(clusters, newly encoded term vectors to pass to store_term_vectors)."""
+    if not actions:
+        return [], {}
+
+    actions = sorted(actions, key=lambda a: -a["cost"])
+    terms = [a["search_term"] for a in actions]
+    vectors, new = embed_terms(con, terms)
+    labels = leader_clusters(vectors, min_similarity)
+
+    clusters = []
+    for leader in dict.fromkeys(labels.tolist()):
+        members = [actions[i] for i in np.flatnonzero(labels == leader)]
+        clusters.append(
+            {
+                "type": "ADD_NEGATIVE_CLUSTER",
+                "representative": actions[leader]["search_term"],
+                "search_terms": [m["search_term"] for m in members],
+                "clicks": sum(m["clicks"] for m in members),
+                "cost": round(sum(m["cost"] for m in members), 2),
+                "why": actions[leader]["why"] + (
+                    f"; {len(members)} near-duplicate terms grouped (similarity>={min_similarity})"
+                    if len(members) > 1 else ""
+                ),
+            }
+        )
+
+    clusters.sort(key=lambda c: -c["cost"])
+    return clusters, new